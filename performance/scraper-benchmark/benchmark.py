@@ -0,0 +1,213 @@
+"""
+Offline benchmark of the bitcointalk scraper parsers
+
+Runs every parser backend over the HTML corpus in
+venue/tests/corpus/bitcointalk and reports pages/sec, p50/p99 latency
+and peak memory per backend and extraction function. Results are
+written as JSON so runs from different commits can be compared:
+
+    python performance/scraper-benchmark/benchmark.py --output before.json
+    python performance/scraper-benchmark/benchmark.py --compare before.json
+"""
+
+import argparse
+import gc
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__)
+)))
+sys.path.insert(0, BASE_DIR)
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'volentix.settings')
+
+import django  # noqa: E402
+django.setup()
+
+from venue.scrapers.bitcointalk import BitcoinTalk  # noqa: E402
+from venue.scrapers.exceptions import ProfileDoesNotExist  # noqa: E402
+from venue.scrapers.parsers import PARSER_BACKENDS  # noqa: E402
+
+CORPUS_DIR = os.path.join(BASE_DIR, 'venue', 'tests', 'corpus', 'bitcointalk')
+EXPECTED_LINKS = ['https://volentix.io']
+POSTS_START = datetime(2000, 1, 1)
+
+
+def load_corpus():
+    corpus = {'profile': [], 'posts': []}
+    for file_name in sorted(os.listdir(CORPUS_DIR)):
+        kind = file_name.split('_')[0]
+        if kind in corpus:
+            with open(os.path.join(CORPUS_DIR, file_name), 'rb') as page:
+                content = page.read()
+            corpus[kind].append((content.decode('latin-1'), content))
+    return corpus
+
+
+def new_scraper(backend, text, content):
+    scraper = BitcoinTalk(parser_backend=backend)
+    scraper.set_params('benchmark', '0', EXPECTED_LINKS)
+    scraper.load_response(200, text, content)
+    return scraper
+
+
+def run_parse(backend, text, content):
+    BitcoinTalk(parser_backend=backend).parser.parse(content)
+
+
+def run_profile(backend, text, content):
+    scraper = new_scraper(backend, text, content)
+    try:
+        scraper.check_profile_exists()
+    except ProfileDoesNotExist:
+        return
+    scraper.load_snapshot()
+    scraper.get_username()
+    scraper.get_user_position()
+    scraper.get_total_posts()
+    scraper.check_signature()
+
+
+def run_check_signature(backend, text, content):
+    # Profile extraction happens outside of the timed section
+    scraper = new_scraper(backend, text, content)
+    try:
+        scraper.check_profile_exists()
+    except ProfileDoesNotExist:
+        return lambda: None
+    scraper.load_snapshot()
+    return scraper.check_signature
+
+
+def run_posts_page(backend, text, content):
+    scraper = new_scraper(backend, text, content)
+    scraper.get_posts_pages()
+    scraper._scrape_posts_page(scraper.document, start=POSTS_START)
+
+
+# Function name -> (corpus kind, runner, whether the runner is a setup
+# step returning the callable to time)
+FUNCTIONS = {
+    'parse_profile': ('profile', run_parse, False),
+    'parse_posts': ('posts', run_parse, False),
+    'profile': ('profile', run_profile, False),
+    'check_signature': ('profile', run_check_signature, True),
+    'posts_page': ('posts', run_posts_page, False),
+}
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    index = int(round((len(values) - 1) * pct / 100.0))
+    return values[index]
+
+
+def measure(backend, function, pages, iterations):
+    _, runner, with_setup = FUNCTIONS[function]
+    latencies = []
+    gc.collect()
+    for _ in range(iterations):
+        for text, content in pages:
+            if with_setup:
+                call = runner(backend, text, content)
+                start = time.perf_counter()
+                call()
+            else:
+                start = time.perf_counter()
+                runner(backend, text, content)
+            latencies.append(time.perf_counter() - start)
+    # Memory is measured in a separate pass so tracing does not skew timing
+    tracemalloc.start()
+    for text, content in pages:
+        runner(backend, text, content)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    total = sum(latencies)
+    return {
+        'backend': backend,
+        'function': function,
+        'pages': len(latencies),
+        'pages_per_sec': round(len(latencies) / total, 2) if total else None,
+        'p50_ms': round(percentile(latencies, 50) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 3),
+        'peak_memory_kb': round(peak / 1024.0, 1)
+    }
+
+
+def git_commit():
+    try:
+        output = subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=BASE_DIR,
+            stderr=subprocess.DEVNULL
+        )
+        return output.decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, previous):
+    old = {(x['backend'], x['function']): x for x in previous['results']}
+    print('\nChange against commit %s:' % previous['meta'].get('commit'))
+    for result in results:
+        before = old.get((result['backend'], result['function']))
+        if not before or not before['pages_per_sec']:
+            continue
+        change = result['pages_per_sec'] / before['pages_per_sec'] - 1
+        print('  %-14s %-16s %+7.1f%% pages/sec  p99 %.3f -> %.3f ms' % (
+            result['backend'],
+            result['function'],
+            change * 100,
+            before['p99_ms'],
+            result['p99_ms']
+        ))
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    arg_parser.add_argument('--iterations', type=int, default=50)
+    arg_parser.add_argument('--backend', action='append',
+                            choices=sorted(PARSER_BACKENDS))
+    arg_parser.add_argument('--function', action='append',
+                            choices=sorted(FUNCTIONS))
+    arg_parser.add_argument('--output', default='scraper_benchmark.json')
+    arg_parser.add_argument('--compare', help='previous results file')
+    args = arg_parser.parse_args()
+
+    corpus = load_corpus()
+    results = []
+    for backend in args.backend or sorted(PARSER_BACKENDS):
+        for function in args.function or list(FUNCTIONS):
+            pages = corpus[FUNCTIONS[function][0]]
+            result = measure(backend, function, pages, args.iterations)
+            results.append(result)
+            print('%-14s %-16s %9.1f pages/sec  p50 %7.3f ms  '
+                  'p99 %7.3f ms  peak %8.1f KB' % (
+                      backend, function, result['pages_per_sec'],
+                      result['p50_ms'], result['p99_ms'],
+                      result['peak_memory_kb']))
+    report = {
+        'meta': {
+            'commit': git_commit(),
+            'date': datetime.utcnow().isoformat(),
+            'python': platform.python_version(),
+            'iterations': args.iterations
+        },
+        'results': results
+    }
+    with open(args.output, 'w') as output:
+        json.dump(report, output, indent=2)
+    print('\nResults written to %s' % args.output)
+    if args.compare:
+        with open(args.compare) as previous:
+            compare(results, json.load(previous))
+
+
+if __name__ == '__main__':
+    main()
@@ -132,7 +132,7 @@ admin.site.register(ForumPost, ForumPostAdmin)
 
 
 class RankingAdmin(admin.ModelAdmin):
-    list_display = ['user_profile', 'rank', 'batch', 'timestamp']
+    list_display = ['user_profile', 'rank', 'date', 'batch', 'timestamp']
 
 
 admin.site.register(Ranking, RankingAdmin)
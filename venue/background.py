@@ -0,0 +1,102 @@
+"""
+Slow jobs started from the API, such as the forum profile lookups
+
+The web workers only enqueue these jobs and answer right away. A job is
+identified by its kind and a key (the looked up forum user ID, ...):
+while a job is in flight, requesting the same job again only adds the
+user to the ones waiting for it instead of enqueuing another one. Once
+done, the job's result is kept in Redis for a little while, where the
+API can poll it, and pushed to the waiting users over the websocket.
+"""
+
+import json
+
+from django.conf import settings
+from redis.exceptions import RedisError
+from ws4redis.publisher import RedisPublisher
+from ws4redis.redis_store import RedisMessage
+
+logger = settings.LOGGER
+
+
+def in_flight_key(kind, key):
+    return 'job:%s:%s' % (kind, key)
+
+
+def result_key(kind, key):
+    return 'job:%s:%s:result' % (kind, key)
+
+
+def waiters_key(kind, key):
+    return 'job:%s:%s:waiters' % (kind, key)
+
+
+def claim(kind, key, username, timeout):
+    """
+    Registers the user as waiting for the job's result
+    :param kind: kind of job
+    :param key: key identifying the job within its kind
+    :param username: user to push the result to
+    :param timeout: seconds after which the job is considered lost and
+        can be enqueued again
+    :return: whether the caller should enqueue the job, False if the
+        same job is already in flight
+    """
+    pipe = settings.REDIS_DB.pipeline()
+    pipe.sadd(waiters_key(kind, key), username)
+    pipe.expire(waiters_key(kind, key), timeout)
+    pipe.set(in_flight_key(kind, key), 1, nx=True, ex=timeout)
+    return bool(pipe.execute()[-1])
+
+
+def get_result(kind, key):
+    """
+    :return: the result of the last run of the job, or None if the job
+        didn't complete recently
+    """
+    result = settings.REDIS_DB.get(result_key(kind, key))
+    if result is None:
+        return None
+    return json.loads(result)
+
+
+def is_in_flight(kind, key):
+    return bool(settings.REDIS_DB.exists(in_flight_key(kind, key)))
+
+
+def complete(kind, key, result, expiry):
+    """
+    Stores the result of the job and lets the same job be enqueued again
+    :param result: JSON serializable result of the job
+    :param expiry: seconds the result is kept for
+    :return: usernames of the users waiting for the result
+    """
+    pipe = settings.REDIS_DB.pipeline()
+    pipe.set(result_key(kind, key), json.dumps(result), ex=expiry)
+    pipe.delete(in_flight_key(kind, key))
+    pipe.smembers(waiters_key(kind, key))
+    pipe.delete(waiters_key(kind, key))
+    return pipe.execute()[2]
+
+
+def release(kind, key):
+    """
+    Lets a job that failed be enqueued again right away
+    :return: usernames of the users that were waiting for the result
+    """
+    pipe = settings.REDIS_DB.pipeline()
+    pipe.delete(in_flight_key(kind, key))
+    pipe.smembers(waiters_key(kind, key))
+    pipe.delete(waiters_key(kind, key))
+    return pipe.execute()[1]
+
+
+def push(username, facility, message):
+    """ Sends the message to the user's websocket connections """
+    try:
+        publisher = RedisPublisher(facility=facility, users=[username])
+        message = json.dumps(message, default=str)
+        publisher.publish_message(RedisMessage(message))
+    except RedisError as exc:
+        # The client can still poll the result
+        logger.warning('Websocket unavailable: %r' % exc)
@@ -0,0 +1,86 @@
+"""
+Shared cache of the read endpoints
+
+Cached values are grouped in namespaces, one per kind of data (forum
+sites, notifications, ...). Every namespace has a version number that is
+part of the keys of its values, and invalidating a namespace just bumps
+its version: the values cached under the previous version are never read
+again and expire on their own. The versions are bumped by the model
+signals and constance config changes, see venue.models.
+"""
+
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+# Namespaces of the cached data
+SITE_CONFIGS = 'site_configs'
+FORUM_SITES = 'forum_sites'
+FORUM_STATS = 'forum_stats'
+NOTIFICATIONS = 'notifications'
+SIGNATURES = 'signatures'
+POINTS = 'points'
+CAMPAIGNS = 'campaigns'
+
+NAMESPACES = (
+    SITE_CONFIGS,
+    FORUM_SITES,
+    FORUM_STATS,
+    NOTIFICATIONS,
+    SIGNATURES,
+    POINTS,
+    CAMPAIGNS
+)
+
+
+def new_version():
+    # Versions start from the current time, so a version key that was
+    # evicted never brings back the values of an older version
+    return int(time.time() * 1000)
+
+
+def version_key(namespace):
+    return 'namespace:%s' % namespace
+
+
+def make_key(namespace, *parts):
+    version = cache.get_or_set(version_key(namespace), new_version, None)
+    parts = ':'.join([str(x) for x in parts])
+    return 'namespace:%s:%s:%s' % (namespace, version, parts)
+
+
+def get_or_compute(namespace, parts, compute):
+    """
+    Returns the cached value, computing and caching it on a miss
+    :param namespace: namespace of the value
+    :param parts: list of values identifying the value in its namespace
+    :param compute: function computing the value
+    """
+    key = make_key(namespace, *parts)
+    value = cache.get(key)
+    if value is None:
+        value = compute()
+        cache.set(key, value, settings.CACHE_TIMEOUT)
+    return value
+
+
+def invalidate(*namespaces):
+    """
+    Drops all the values cached in the given namespaces. This is done
+    again once the current transaction is committed, as other workers
+    may cache the data from before the change in the meantime.
+    """
+    bump_versions(namespaces)
+    transaction.on_commit(lambda: bump_versions(namespaces))
+
+
+def bump_versions(namespaces):
+    for namespace in namespaces:
+        key = version_key(namespace)
+        try:
+            cache.incr(key)
+        except ValueError:
+            # No version yet, or it was evicted
+            cache.set(key, new_version(), None)
@@ -0,0 +1,81 @@
+"""
+Per-user dashboard documents kept in Redis
+
+The user's details and the user's part of the stats shown by the
+dashboard are built from Postgres once, see UserProfile.build_dashboard,
+and kept in Redis as a single document. The get_user and get_stats
+endpoints read it with one round trip, however long the user's post
+history.
+
+The document of a user is dropped whenever the user's data changes (see
+the model signals in venue.models), and the scrape, points and ranking
+tasks rebuild the documents of the users they touched. Documents are
+also rebuilt once a day, as the daily stats move on, and expire after
+DASHBOARD_TIMEOUT seconds in case a change went unnoticed.
+
+The token amounts depend on the global total points, so the documents
+hold points only and the tokens are derived when reading.
+"""
+
+import json
+
+from django.conf import settings
+from django.db import transaction
+from redis.exceptions import RedisError
+
+logger = settings.LOGGER
+
+
+def document_key(user_id):
+    return 'dashboard:%s' % user_id
+
+
+def read(user_id):
+    """
+    :return: tuple of the user's document and the global total points,
+        each None if missing
+    """
+    try:
+        document, global_total = settings.REDIS_DB.mget(
+            document_key(user_id),
+            'global_total_points'
+        )
+    except RedisError as exc:
+        logger.warning('Dashboard unavailable: %r' % exc)
+        return None, None
+    if document is not None:
+        document = json.loads(document)
+    if global_total is not None:
+        global_total = round(float(global_total), 2)
+    return document, global_total
+
+
+def store(user_id, document):
+    try:
+        settings.REDIS_DB.set(
+            document_key(user_id),
+            json.dumps(document, default=str),
+            ex=settings.DASHBOARD_TIMEOUT
+        )
+    except RedisError as exc:
+        logger.warning('Dashboard unavailable: %r' % exc)
+
+
+def drop(user_ids):
+    """
+    Drops the documents of the users. This is done again once the
+    current transaction is committed, as the document may be rebuilt
+    from the data before the change in the meantime.
+    """
+    keys = [document_key(x) for x in user_ids if x is not None]
+    if not keys:
+        return
+    delete_documents(keys)
+    transaction.on_commit(lambda: delete_documents(keys))
+
+
+def delete_documents(keys):
+    try:
+        settings.REDIS_DB.delete(*keys)
+    except RedisError as exc:
+        logger.warning('Dashboard unavailable: %r' % exc)
@@ -0,0 +1,180 @@
+"""
+Leaderboard kept in a Redis sorted set
+
+Every user profile taking part in the campaign is a member of the set,
+scored by its credited points. The score is moved as soon as posts are
+credited or uncredited, so a user's rank and points can be read at any
+time in logarithmic time without waiting for compute_ranking. The
+leaderboard pages are served from the snapshot refreshed by compute_ranking,
+which also rebuilds the whole set from Postgres, correcting any drift
+from the incremental updates.
+
+Scores are stored in hundredths of a point so that the increments stay
+exact integers.
+
+Changes that the incremental updates don't cover, such as deletions,
+request a recompute instead: compute_ranking then runs once, after the
+requests have quietened down.
+"""
+
+import time
+from decimal import Decimal
+
+import celery
+from django.conf import settings
+from redis.exceptions import RedisError
+
+logger = settings.LOGGER
+
+LEADERBOARD_KEY = 'leaderboard'
+REBUILD_KEY = 'leaderboard:rebuild'
+# Time of the last recompute request, and of the first one not handled
+# yet while a recompute is scheduled
+RECOMPUTE_REQUESTED_KEY = 'leaderboard:recompute:requested'
+RECOMPUTE_SCHEDULED_KEY = 'leaderboard:recompute:scheduled'
+
+# Number of members written per ZADD when rebuilding the set
+REBUILD_CHUNK = 1000
+
+# Rank of a member, shared with the members having the same score so that
+# it matches the RANK() computed by compute_ranking. Returns -1 for
+# unknown members.
+RANK_SCRIPT = """
+local score = redis.call('ZSCORE', KEYS[1], ARGV[1])
+if not score then
+    return -1
+end
+return redis.call('ZCOUNT', KEYS[1], '(' .. score, '+inf') + 1
+"""
+
+rank_script = settings.REDIS_DB.register_script(RANK_SCRIPT)
+
+
+def to_score(points):
+    return int((Decimal(points) * 100).quantize(Decimal(1)))
+
+
+def to_points(score):
+    return round(float(score) / 100, 2)
+
+
+def add_points(changes):
+    """
+    Moves the scores of the users whose credited points changed
+    :param changes: dict of user profile ID to the points added, negative
+        for the points removed
+    """
+    changes = {k: to_score(v) for k, v in changes.items() if v}
+    if not changes:
+        return
+    try:
+        pipe = settings.REDIS_DB.pipeline(transaction=False)
+        for user_profile_id, score in changes.items():
+            pipe.zincrby(LEADERBOARD_KEY, str(user_profile_id), score)
+        pipe.execute()
+    except RedisError as exc:
+        # The next compute_ranking brings the leaderboard up to date
+        logger.warning('Leaderboard unavailable: %r' % exc)
+
+
+def rebuild(user_points):
+    """
+    Replaces the whole leaderboard
+    :param user_points: list of dicts with user_profile_id and total_points
+    """
+    try:
+        pipe = settings.REDIS_DB.pipeline()
+        pipe.delete(REBUILD_KEY)
+        for i in range(0, len(user_points), REBUILD_CHUNK):
+            members = []
+            for user in user_points[i:i + REBUILD_CHUNK]:
+                members.extend([
+                    to_score(user['total_points']),
+                    str(user['user_profile_id'])
+                ])
+            pipe.zadd(REBUILD_KEY, *members)
+        if user_points:
+            pipe.rename(REBUILD_KEY, LEADERBOARD_KEY)
+        else:
+            pipe.delete(LEADERBOARD_KEY)
+        pipe.execute()
+    except RedisError as exc:
+        logger.warning('Leaderboard unavailable: %r' % exc)
+
+
+def get_rank(user_profile_id):
+    """
+    :return: rank of the user, or None if the user is not ranked or the
+        leaderboard is unavailable
+    """
+    try:
+        rank = rank_script(keys=[LEADERBOARD_KEY], args=[str(user_profile_id)])
+    except RedisError as exc:
+        logger.warning('Leaderboard unavailable: %r' % exc)
+        return None
+    return rank if rank > 0 else None
+
+
+def get_points(user_profile_id):
+    """
+    :return: credited points of the user, or None if the user is not
+        ranked or the leaderboard is unavailable
+    """
+    try:
+        score = settings.REDIS_DB.zscore(LEADERBOARD_KEY, str(user_profile_id))
+    except RedisError as exc:
+        logger.warning('Leaderboard unavailable: %r' % exc)
+        return None
+    return to_points(score) if score is not None else None
+
+
+def request_recompute():
+    """
+    Asks for compute_ranking to run once no more requests came for
+    RANKING_DEBOUNCE seconds, or RANKING_DEBOUNCE_MAX seconds after the
+    first request at the latest. Never waits for the ranking.
+    """
+    now = time.time()
+    try:
+        pipe = settings.REDIS_DB.pipeline()
+        pipe.set(RECOMPUTE_REQUESTED_KEY, now)
+        # Expires in case the scheduled task is lost
+        pipe.set(
+            RECOMPUTE_SCHEDULED_KEY,
+            now,
+            nx=True,
+            ex=settings.RANKING_DEBOUNCE_MAX * 2
+        )
+        scheduled = pipe.execute()[-1]
+    except RedisError as exc:
+        logger.warning('Leaderboard unavailable: %r' % exc)
+        return
+    if scheduled:
+        celery.current_app.send_task(
+            'venue.tasks.recompute_ranking',
+            queue='compute',
+            countdown=settings.RANKING_DEBOUNCE
+        )
+
+
+def recompute_delay():
+    """
+    :return: seconds to wait before the requested recompute, 0 if it
+        should run now, in which case the later requests schedule
+        another one
+    """
+    requested, scheduled = settings.REDIS_DB.mget(
+        RECOMPUTE_REQUESTED_KEY,
+        RECOMPUTE_SCHEDULED_KEY
+    )
+    now = time.time()
+    quiet = now - float(requested or 0)
+    waited = now - float(scheduled or 0)
+    delay = min(
+        settings.RANKING_DEBOUNCE - quiet,
+        settings.RANKING_DEBOUNCE_MAX - waited
+    )
+    if delay > 0:
+        return delay
+    settings.REDIS_DB.delete(RECOMPUTE_SCHEDULED_KEY)
+    return 0
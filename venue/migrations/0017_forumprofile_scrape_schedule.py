@@ -0,0 +1,24 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('venue', '0016_userprofile_verto_address'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='forumprofile',
+            name='next_scrape',
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='forumprofile',
+            name='scrape_interval',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+    ]
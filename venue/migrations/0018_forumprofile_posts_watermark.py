@@ -0,0 +1,29 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('venue', '0017_forumprofile_scrape_schedule'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='forumprofile',
+            name='last_message_id',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='forumprofile',
+            name='last_post_timestamp',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='forumprofile',
+            name='last_deletion_check',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('venue', '0018_forumprofile_posts_watermark'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='forumprofile',
+            name='profile_fingerprint',
+            field=models.CharField(blank=True, max_length=40),
+        ),
+    ]
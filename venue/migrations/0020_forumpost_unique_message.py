@@ -0,0 +1,29 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('venue', '0019_forumprofile_profile_fingerprint'),
+    ]
+
+    operations = [
+        # Keep a single row of any post stored more than once
+        migrations.RunSQL(
+            """
+            DELETE FROM venue_forumpost A
+            USING venue_forumpost B
+            WHERE A.forum_profile_id = B.forum_profile_id
+              AND A.message_id = B.message_id
+              AND A.ctid > B.ctid;
+            """,
+            migrations.RunSQL.noop
+        ),
+        migrations.AlterUniqueTogether(
+            name='forumpost',
+            unique_together=set([('forum_profile', 'message_id')]),
+        ),
+    ]
@@ -0,0 +1,60 @@
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+
+def leader_board_snapshot():
+    return """
+        CREATE MATERIALIZED VIEW venue_leaderboard AS
+        WITH POSTS AS (SELECT P.forum_profile_id,
+                              coalesce(sum(P.total_points), 0.0) AS total_points,
+                              coalesce(count(P.id), 0) AS total_count
+                       FROM venue_forumpost P
+                       WHERE credited = TRUE
+                       GROUP BY P.forum_profile_id),
+             RANK AS (SELECT rank :: INT, user_profile_id
+                      FROM (SELECT id, rank, timestamp, user_profile_id, row_number() OVER (
+                        PARTITION BY user_profile_id ORDER BY timestamp DESC
+                        ) AS row_number
+                            FROM venue_ranking) AS tmp
+                      WHERE row_number = 1)
+        SELECT U.username :: TEXT,
+               coalesce(sum(P.total_count), 0) :: BIGINT AS total_posts,
+               coalesce(sum(P.total_points), 0.0) :: NUMERIC AS total_points,
+               coalesce(RK.rank, 0) AS rank
+        FROM venue_userprofile UP
+               JOIN venue_forumprofile FP ON UP.id = FP.user_profile_id
+               JOIN auth_user U ON UP.user_id = U.id
+               LEFT JOIN POSTS AS P ON FP.id = P.forum_profile_id
+               LEFT JOIN RANK RK ON UP.id = RK.user_profile_id
+        WHERE FP.active IS TRUE AND verified IS TRUE AND U.is_active IS TRUE AND UP.email_confirmed IS TRUE
+        GROUP BY U.id, RK.RANK;
+
+        CREATE UNIQUE INDEX venue_leaderboard_username ON venue_leaderboard (username);
+    """
+
+
+def forum_stats_snapshot():
+    return """
+        CREATE MATERIALIZED VIEW venue_forumstats AS
+        SELECT * FROM forum_stats();
+
+        CREATE UNIQUE INDEX venue_forumstats_site_name ON venue_forumstats (site_name);
+    """
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('venue', '0020_forumpost_unique_message'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            leader_board_snapshot(),
+            'DROP MATERIALIZED VIEW venue_leaderboard;'
+        ),
+        migrations.RunSQL(
+            forum_stats_snapshot(),
+            'DROP MATERIALIZED VIEW venue_forumstats;'
+        ),
+    ]
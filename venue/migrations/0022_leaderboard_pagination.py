@@ -0,0 +1,34 @@
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+
+def leader_board_totals():
+    return """
+        CREATE MATERIALIZED VIEW venue_leaderboard_totals AS
+        SELECT (SELECT batch FROM venue_ranking ORDER BY timestamp DESC LIMIT 1) AS batch,
+               count(*) AS total_users,
+               coalesce(sum(total_posts), 0) :: BIGINT AS total_posts,
+               coalesce(sum(total_points), 0.0) :: NUMERIC AS total_points
+        FROM venue_leaderboard;
+
+        CREATE UNIQUE INDEX venue_leaderboard_totals_batch ON venue_leaderboard_totals (batch);
+    """
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('venue', '0021_leaderboard_snapshot'),
+    ]
+
+    operations = [
+        # Keyset pagination of the leaderboard follows this order
+        migrations.RunSQL(
+            'CREATE INDEX venue_leaderboard_rank ON venue_leaderboard (rank, username);',
+            'DROP INDEX venue_leaderboard_rank;'
+        ),
+        migrations.RunSQL(
+            leader_board_totals(),
+            'DROP MATERIALIZED VIEW venue_leaderboard_totals;'
+        ),
+    ]
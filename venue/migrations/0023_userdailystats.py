@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+def backfill_daily_stats():
+    # Stats of the last seven days, the ones shown by the dashboard
+    return """
+        INSERT INTO venue_userdailystats (id, user_profile_id, date, credited_posts,
+                                          pending_posts, total_posts, rank)
+        SELECT md5(random() :: TEXT || clock_timestamp() :: TEXT) :: UUID,
+               UP.id,
+               D.day,
+               (SELECT count(*)
+                FROM venue_forumpost P
+                  JOIN venue_forumprofile FP ON P.forum_profile_id = FP.id
+                WHERE FP.user_profile_id = UP.id AND FP.verified IS TRUE
+                  AND P.credited IS TRUE AND P.date_credited :: DATE = D.day),
+               (SELECT count(*)
+                FROM venue_forumpost P
+                  JOIN venue_forumprofile FP ON P.forum_profile_id = FP.id
+                WHERE FP.user_profile_id = UP.id AND FP.verified IS TRUE
+                  AND P.timestamp :: DATE <= D.day
+                  AND (P.date_matured IS NULL OR P.date_matured :: DATE > D.day)),
+               (SELECT count(*)
+                FROM venue_forumpost P
+                  JOIN venue_forumprofile FP ON P.forum_profile_id = FP.id
+                WHERE FP.user_profile_id = UP.id AND FP.verified IS TRUE
+                  AND P.timestamp :: DATE <= D.day),
+               coalesce((SELECT R.rank
+                         FROM venue_ranking R
+                         WHERE R.user_profile_id = UP.id AND R.timestamp :: DATE <= D.day
+                         ORDER BY R.timestamp DESC
+                         LIMIT 1), 0)
+        FROM venue_userprofile UP
+          CROSS JOIN (SELECT generate_series(current_date - 6, current_date, '1 day') :: DATE AS day) AS D
+        WHERE EXISTS (SELECT 1
+                      FROM venue_forumprofile FP
+                      WHERE FP.user_profile_id = UP.id AND FP.verified IS TRUE);
+    """
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('venue', '0022_leaderboard_pagination'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserDailyStats',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('date', models.DateField()),
+                ('credited_posts', models.IntegerField(default=0)),
+                ('pending_posts', models.IntegerField(default=0)),
+                ('total_posts', models.IntegerField(default=0)),
+                ('rank', models.IntegerField(default=0)),
+                ('user_profile', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_stats', to='venue.UserProfile')),
+            ],
+        ),
+        migrations.AlterUniqueTogether(
+            name='userdailystats',
+            unique_together=set([('user_profile', 'date')]),
+        ),
+        migrations.RunSQL(
+            backfill_daily_stats(),
+            migrations.RunSQL.noop
+        ),
+    ]
@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import venue.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('venue', '0023_userdailystats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ranking',
+            name='date',
+            field=models.DateField(null=True),
+        ),
+        # Date the existing rankings and keep the latest one of each day
+        migrations.RunSQL(
+            """
+            UPDATE venue_ranking SET date = "timestamp" :: DATE;
+
+            DELETE FROM venue_ranking A
+            USING venue_ranking B
+            WHERE A.user_profile_id = B.user_profile_id
+              AND A.date = B.date
+              AND (A."timestamp", A.id) < (B."timestamp", B.id);
+            """,
+            migrations.RunSQL.noop
+        ),
+        migrations.AlterField(
+            model_name='ranking',
+            name='date',
+            field=models.DateField(default=venue.models.today),
+        ),
+        migrations.AlterField(
+            model_name='ranking',
+            name='batch',
+            field=models.IntegerField(db_index=True, default=1),
+        ),
+        migrations.AlterUniqueTogether(
+            name='ranking',
+            unique_together=set([('user_profile', 'date')]),
+        ),
+    ]
@@ -1,19 +1,30 @@
+import hashlib
+import json
 import os
+import random
 import uuid
+from datetime import timedelta
 
-import celery
 from constance import config
+from constance.signals import config_updated
 from dateutil import parser
 from django.conf import settings
 from django.contrib.auth.models import User
 from django.contrib.postgres.fields import JSONField
 from django.core.exceptions import ValidationError
-from django.db import models, connection
+from django.db import models, connection, transaction
+from django.db.models import F, Value
+from django.db.models.expressions import RawSQL
 from django.db.models.functions import Coalesce
 from django.dispatch import receiver
 from django.utils import timezone
 from hashids import Hashids
 
+from venue import caching, dashboard, leaderboard
+
+# Number of rows written per statement by the bulk record methods
+RECORD_CHUNK = 1000
+
 
 def compute_total_points():
     total_points = settings.REDIS_DB.get('global_total_points')
@@ -22,6 +33,10 @@ def compute_total_points():
     return round(float(total_points), 2)
 
 
+def today():
+    return timezone.now().date()
+
+
 def dict_fetchall(cursor):
     """
     Returns all rows from a cursor as a dict
@@ -47,18 +62,22 @@ class Campaign(models.Model):
         Retrieves the current campaign, if any
         :return: None of Campaign object
         """
-        try:
-            dt_now = timezone.now()
-            current = Campaign.objects.filter(
-                campaign_start__lt=dt_now
-            )
-            current = current.latest('campaign_start')
-            if current.campaign_end:
-                if dt_now > current.campaign_end:
-                    return None
-            return current
-        except Campaign.DoesNotExist:
-            return None
+        # The campaigns are cached, the dates are checked on every call
+        campaigns = caching.get_or_compute(
+            caching.CAMPAIGNS,
+            ['all'],
+            lambda: list(Campaign.objects.filter(
+                campaign_start__isnull=False
+            ).order_by('-campaign_start'))
+        )
+        dt_now = timezone.now()
+        for current in campaigns:
+            if current.campaign_start < dt_now:
+                if current.campaign_end:
+                    if dt_now > current.campaign_end:
+                        return None
+                return current
+        return None
 
 
 class ForumSite(models.Model):
@@ -73,9 +92,13 @@ class ForumSite(models.Model):
 
     @classmethod
     def get_stats(cls):
-        with connection.cursor() as c:
-            c.callproc('forum_stats')
-            return dict_fetchall(c)
+        # Snapshot of forum_stats(), refreshed by compute_ranking
+        def query_db():
+            with connection.cursor() as c:
+                c.execute('SELECT * FROM venue_forumstats')
+                return dict_fetchall(c)
+
+        return caching.get_or_compute(caching.FORUM_STATS, ['all'], query_db)
 
 
 class ForumUserRank(models.Model):
@@ -149,13 +172,102 @@ class UserProfile(models.Model):
         return self.user.username
 
     @classmethod
-    def get_leader_board_data(cls):
+    def get_leader_board_data(cls, username=None, after=None, before=None,
+                              limit=None):
+        """
+        Reads the leaderboard snapshot, refreshed by compute_ranking. The
+        rows are ordered by rank then username, which is also the order of
+        the index used to read a page of them.
+        :param username: only read the row of this user
+        :param after: (rank, username) tuple, read the rows after this one
+        :param before: (rank, username) tuple, read the rows before this one
+        :param limit: maximum number of rows to read
+        :return: list of dicts with username, total_posts, total_points,
+            total_tokens and rank, ordered by rank
+        """
         total_points = compute_total_points()
         vtx_available = config.VTX_AVAILABLE
-        max_referrals = config.MAX_REFERRALS
+        sql = """
+        SELECT username,
+               total_posts,
+               total_points,
+               CASE WHEN %(total_points)s = 0
+               THEN 0
+               ELSE total_points / %(total_points)s * %(vtx_available)s
+               END :: BIGINT AS total_tokens,
+               rank
+        FROM venue_leaderboard
+        """
+        params = {
+            'total_points': total_points,
+            'vtx_available': vtx_available,
+            'limit': limit
+        }
+        order = 'ASC'
+        if username:
+            sql += 'WHERE username = %(username)s '
+            params['username'] = username
+        elif after:
+            sql += 'WHERE (rank, username) > (%(rank)s, %(key)s) '
+            params['rank'], params['key'] = after
+        elif before:
+            # Read backwards from the given row, reversed below
+            sql += 'WHERE (rank, username) < (%(rank)s, %(key)s) '
+            params['rank'], params['key'] = before
+            order = 'DESC'
+        sql += 'ORDER BY rank {0}, username {0} LIMIT %(limit)s'.format(order)
         with connection.cursor() as c:
-            c.callproc('leader_board_data', [total_points, vtx_available, max_referrals])
-            return dict_fetchall(c)
+            c.execute(sql, params)
+            rows = dict_fetchall(c)
+        if order == 'DESC':
+            rows.reverse()
+        return rows
+
+    @classmethod
+    def get_leader_board_around(cls, username, count):
+        """
+        Reads the rows of the leaderboard snapshot around a user
+        :param username: username of the user
+        :param count: number of rows to read above and below the user
+        :return: list of rows as in `get_leader_board_data`, empty if the
+            user is not in the leaderboard
+        """
+        user_data = cls.get_leader_board_data(username=username)
+        if not user_data:
+            return []
+        key = (user_data[0]['rank'], username)
+        above = cls.get_leader_board_data(before=key, limit=count)
+        below = cls.get_leader_board_data(after=key, limit=count)
+        return above + user_data + below
+
+    @classmethod
+    def get_leader_board_totals(cls):
+        """
+        :return: dict with the ranking batch of the leaderboard snapshot,
+            and its total_users, total_posts and total_points
+        """
+        with connection.cursor() as c:
+            c.execute('SELECT * FROM venue_leaderboard_totals')
+            totals = dict_fetchall(c)
+        if not totals:
+            return {
+                'batch': None,
+                'total_users': 0,
+                'total_posts': 0,
+                'total_points': 0
+            }
+        return totals[0]
+
+    @classmethod
+    def refresh_leader_board(cls):
+        """ Rebuilds the leaderboard and forum stats snapshots """
+        # The snapshots are swapped together, so the totals always belong
+        # to the rankings being served
+        with transaction.atomic(), connection.cursor() as c:
+            c.execute('REFRESH MATERIALIZED VIEW CONCURRENTLY venue_leaderboard')
+            c.execute('REFRESH MATERIALIZED VIEW CONCURRENTLY venue_leaderboard_totals')
+            c.execute('REFRESH MATERIALIZED VIEW CONCURRENTLY venue_forumstats')
+        caching.invalidate(caching.FORUM_STATS)
 
     @classmethod
     def get_by_referral_code(cls, referral_code):
@@ -212,11 +324,16 @@ class UserProfile(models.Model):
     def get_ranking(self, date=None):
         if not date:
             date = timezone.now().date()
+        # The current rank is read straight from the leaderboard
+        if str(date) == str(timezone.now().date()):
+            rank = leaderboard.get_rank(self.id)
+            if rank:
+                return rank
 
         def query_db(date):
             rankings = Ranking.objects.filter(
                 user_profile_id=self.id,
-                timestamp__date=str(date)
+                date=str(date)
             )
             return rankings
 
@@ -225,20 +342,141 @@ class UserProfile(models.Model):
         try:
             rank = rankings.latest().rank
         except Ranking.DoesNotExist:
-            # Trigger ranking task if ranking does not exist
-            job = celery.current_app.send_task(
-                'venue.tasks.compute_ranking',
-                queue='compute'
+            # Ask for the ranking without waiting for it, the previous
+            # rank is served meanwhile. Only the users with active and
+            # verified forum profiles are ranked, the others never get one.
+            if self.forum_profiles.filter(active=True, verified=True).exists():
+                leaderboard.request_recompute()
+            rankings = Ranking.objects.filter(
+                user_profile_id=self.id,
+                date__lte=str(date)
             )
-            job.get()
-            rankings = query_db(date)
             try:
-                if rankings.latest():
-                    rank = rankings.latest().rank
+                rank = rankings.latest().rank
             except Ranking.DoesNotExist:
                 rank = 0
         return rank
 
+    def get_daily_stats(self, days=7):
+        """
+        Posts and rank of the user for each of the last days, with a
+        single query. Days without stats had no activity: the posts and
+        rank carry over from the previous day.
+        :param days: number of days, today included
+        :return: list of dicts with the posts, rank and date, oldest first
+        """
+        last_day = today()
+        first_day = last_day - timedelta(days=days - 1)
+        rows = list(self.daily_stats.filter(
+            date__lte=last_day
+        ).filter(
+            models.Q(date__gte=first_day) |
+            models.Q(date=self.daily_stats.filter(
+                date__lt=first_day
+            ).order_by('-date').values('date')[:1])
+        ).order_by('date'))
+        daily_stats = []
+        previous = None
+        for offset in range(days):
+            day = first_day + timedelta(days=offset)
+            while rows and rows[0].date <= day:
+                previous = rows.pop(0)
+            posts = {'credited': 0, 'pending': 0, 'total': 0}
+            rank = 0
+            if previous:
+                if previous.date == day:
+                    posts['credited'] = previous.credited_posts
+                posts['pending'] = previous.pending_posts
+                posts['total'] = previous.total_posts
+                rank = previous.rank
+            daily_stats.append({'posts': posts, 'rank': rank, 'date': str(day)})
+        return daily_stats
+
+    def build_dashboard(self):
+        """ Dashboard document of the user, see venue.dashboard """
+        credited = models.Q(posts__credited=True)
+        forum_profiles = self.forum_profiles.filter(
+            verified=True
+        ).select_related('forum', 'forum_rank').annotate(
+            num_posts=models.Sum(models.Case(
+                models.When(credited, then=1),
+                default=0,
+                output_field=models.IntegerField()
+            )),
+            points=models.Sum(models.Case(
+                models.When(credited, then='posts__total_points'),
+                default=0,
+                output_field=models.DecimalField()
+            ))
+        )
+        profiles = []
+        total_points = 0
+        for fp in forum_profiles:
+            points = round(float(fp.points or 0), 2)
+            profiles.append({
+                'forumSite': fp.forum.name,
+                'forumUserId': fp.forum_user_id,
+                'forumUserRank': fp.forum_rank.name,
+                'rankBonusPercentage': fp.forum_rank.bonus_percentage,
+                'numPosts': fp.num_posts or 0,
+                'totalPoints': points
+            })
+            if fp.active:
+                total_points += points
+        daily_stats = self.get_daily_stats()
+        document = {
+            'date': str(today()),
+            'user': {
+                'username': self.user.username,
+                'email': self.user.email,
+                'language': self.language,
+                'email_confirmed': self.email_confirmed,
+                'enabled_2fa': self.enabled_2fa,
+                'referral_code': self.referral_code
+            },
+            'profiles': profiles,
+            'daily_stats': daily_stats,
+            'total_posts': daily_stats[-1]['posts']['total'],
+            'total_points': round(total_points, 2),
+            'referrals_bonuses': self.referrals_bonuses,
+            'overall_rank': self.get_ranking()
+        }
+        # The version only changes with the content, so that rebuilding
+        # an unchanged document keeps the clients' copies valid
+        content = json.dumps(document, sort_keys=True, default=str)
+        document['version'] = hashlib.sha1(content.encode('utf-8')).hexdigest()
+        document['timestamp'] = int(timezone.now().timestamp())
+        return document
+
+    def refresh_dashboard(self):
+        document = self.build_dashboard()
+        dashboard.store(self.user_id, document)
+        return document
+
+    @classmethod
+    def refresh_dashboards(cls, user_profile_ids):
+        for user_profile in cls.objects.filter(
+            id__in=user_profile_ids
+        ).select_related('user'):
+            user_profile.refresh_dashboard()
+
+    @classmethod
+    def get_dashboard(cls, user):
+        """
+        Reads the dashboard document of the user, building it on a miss
+        :return: tuple of the document, None if the user has no profile,
+            and the global total points
+        """
+        document, global_total = dashboard.read(user.id)
+        if global_total is None:
+            global_total = compute_total_points()
+        if document is None or document['date'] != str(today()):
+            user_profile = cls.objects.filter(user=user).first()
+            if user_profile is None:
+                return None, global_total
+            document = user_profile.refresh_dashboard()
+        return document, global_total
+
     @property
     def total_posts(self):
         posts = 0
@@ -277,37 +515,175 @@ class UserProfile(models.Model):
 
 
 class Ranking(models.Model):
+    """ Rank of a user on a given day, as of the last ranking batch of
+    that day """
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
-    batch = models.IntegerField(default=1)
+    batch = models.IntegerField(default=1, db_index=True)
     user_profile = models.ForeignKey(
         UserProfile,
         related_name='rankings',
         on_delete=models.CASCADE
     )
     rank = models.IntegerField(default=0)
+    date = models.DateField(default=today)
     timestamp = models.DateTimeField(default=timezone.now)
 
     class Meta:
         get_latest_by = 'timestamp'
+        unique_together = ('user_profile', 'date')
 
     @classmethod
-    def clean_ranking(cls):
+    def compute_user_points(cls):
         """
-        Remove duplicated lines for each day
-        :return: removed ids
+        Totals the credited points of the active users with verified
+        forum profiles and ranks them, in a single query
+        :return: list of dicts with user_profile_id, total_points, rank
+            and global_total, highest points first
         """
         sql = """
-        WITH RANK_LINES AS (SELECT id, user_profile_id, "timestamp",
-                           row_number() OVER (PARTITION BY user_profile_id ORDER BY "timestamp" DESC) AS rank_count
-                    FROM venue_ranking)
-        DELETE
-        FROM venue_ranking
-        WHERE id IN (SELECT id FROM RANK_LINES WHERE rank_count > 1)
-            RETURNING id;
+        WITH PROFILE_POINTS AS (SELECT fp.user_profile_id,
+                                       ROUND(COALESCE(SUM(p.total_points), 0), 2) AS points
+                                FROM venue_forumprofile fp
+                                  LEFT JOIN venue_forumpost p
+                                    ON p.forum_profile_id = fp.id AND p.credited
+                                WHERE fp.active AND fp.verified
+                                GROUP BY fp.id),
+             USER_POINTS AS (SELECT pp.user_profile_id, SUM(pp.points) AS total_points
+                             FROM PROFILE_POINTS pp
+                               JOIN venue_userprofile up ON up.id = pp.user_profile_id
+                               JOIN auth_user u ON u.id = up.user_id
+                             WHERE u.is_active
+                             GROUP BY pp.user_profile_id)
+        SELECT user_profile_id,
+               total_points,
+               rank() OVER (ORDER BY total_points DESC) AS rank,
+               SUM(total_points) OVER () AS global_total
+        FROM USER_POINTS
+        ORDER BY rank, user_profile_id;
         """
         with connection.cursor() as c:
             c.execute(sql)
-            return c.fetchall()
+            return dict_fetchall(c)
+
+    @classmethod
+    def record(cls, batch, user_points):
+        """
+        Saves the ranks of a batch, replacing the ranks of the same day
+        :param batch: ranking batch number
+        :param user_points: list of dicts with user_profile_id and rank
+        """
+        dt_now = timezone.now()
+        with transaction.atomic(), connection.cursor() as c:
+            for i in range(0, len(user_points), RECORD_CHUNK):
+                rows = []
+                params = []
+                for user in user_points[i:i + RECORD_CHUNK]:
+                    rows.append('(%s, %s, %s, %s, %s, %s)')
+                    params.extend([
+                        uuid.uuid4(),
+                        batch,
+                        user['user_profile_id'],
+                        user['rank'],
+                        dt_now.date(),
+                        dt_now
+                    ])
+                sql = """
+                INSERT INTO venue_ranking (id, batch, user_profile_id, rank, date, "timestamp")
+                VALUES {values}
+                ON CONFLICT (user_profile_id, date) DO UPDATE
+                  SET batch = EXCLUDED.batch,
+                      rank = EXCLUDED.rank,
+                      "timestamp" = EXCLUDED."timestamp";
+                """.format(values=', '.join(rows))
+                c.execute(sql, params)
+
+
+class UserDailyStats(models.Model):
+    """ Posts and rank of a user at the end of each day, kept up to date
+    as the posts are scraped and the users ranked """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user_profile = models.ForeignKey(
+        UserProfile,
+        related_name='daily_stats',
+        on_delete=models.CASCADE
+    )
+    date = models.DateField()
+    # Posts credited on that day and still credited
+    credited_posts = models.IntegerField(default=0)
+    # Posts not matured yet and all the posts, at the end of the day
+    pending_posts = models.IntegerField(default=0)
+    total_posts = models.IntegerField(default=0)
+    rank = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ('user_profile', 'date')
+
+    @classmethod
+    def record(cls, changes):
+        """
+        Updates today's stats of the users, starting them from the user's
+        previous day when they don't exist yet
+        :param changes: dict of user profile ID to a dict of the changes,
+            with the `credited`, `pending` and `total` posts to add and the
+            new `rank`, all optional
+        """
+        if not changes:
+            return
+        today = timezone.now().date()
+        changes = list(changes.items())
+        with transaction.atomic(), connection.cursor() as c:
+            for i in range(0, len(changes), RECORD_CHUNK):
+                rows = []
+                params = []
+                for user_profile_id, change in changes[i:i + RECORD_CHUNK]:
+                    rows.append('(%s, %s, %s, %s, %s, %s)')
+                    params.extend([
+                        uuid.uuid4(),
+                        user_profile_id,
+                        change.get('credited', 0),
+                        change.get('pending', 0),
+                        change.get('total', 0),
+                        change.get('rank')
+                    ])
+                values = ', '.join(rows)
+                sql = """
+                INSERT INTO venue_userdailystats (id, user_profile_id, date, credited_posts,
+                                                  pending_posts, total_posts, rank)
+                SELECT C.id :: UUID, C.user_profile_id :: UUID, %s, 0,
+                       coalesce(PREV.pending_posts, 0),
+                       coalesce(PREV.total_posts, 0),
+                       coalesce(PREV.rank, 0)
+                FROM (VALUES {values}) AS C (id, user_profile_id, credited, pending, total, rank)
+                  LEFT JOIN LATERAL (SELECT pending_posts, total_posts, rank
+                                     FROM venue_userdailystats S
+                                     WHERE S.user_profile_id = C.user_profile_id :: UUID AND S.date < %s
+                                     ORDER BY S.date DESC
+                                     LIMIT 1) PREV ON TRUE
+                ON CONFLICT (user_profile_id, date) DO NOTHING;
+
+                UPDATE venue_userdailystats S
+                SET credited_posts = S.credited_posts + C.credited,
+                    pending_posts = S.pending_posts + C.pending,
+                    total_posts = S.total_posts + C.total,
+                    rank = coalesce(C.rank :: INT, S.rank)
+                FROM (VALUES {values}) AS C (id, user_profile_id, credited, pending, total, rank)
+                WHERE S.user_profile_id = C.user_profile_id :: UUID AND S.date = %s;
+                """.format(values=values)
+                c.execute(sql, [today] + params + [today] + params + [today])
+
+    @classmethod
+    def uncredit(cls, changes):
+        """
+        Removes uncredited posts from the stats of the day they were
+        credited
+        :param changes: dict of (user profile ID, date) to the number of
+            posts uncredited
+        """
+        for (user_profile_id, date), count in changes.items():
+            cls.objects.filter(
+                user_profile_id=user_profile_id,
+                date=date
+            ).update(credited_posts=F('credited_posts') - count)
 
 
 class ForumProfile(models.Model):
@@ -338,6 +714,15 @@ class ForumProfile(models.Model):
     # The flag below is overwritten every scrape
     last_scrape = models.DateTimeField(null=True, blank=True)
     last_page_status = JSONField(default=list)
+    # Adaptive scrape schedule, see schedule_next_scrape()
+    next_scrape = models.DateTimeField(null=True, blank=True, db_index=True)
+    scrape_interval = models.IntegerField(null=True, blank=True)  # seconds
+    # Newest post seen in the scrapes, the posts scrape stops there
+    last_message_id = models.BigIntegerField(null=True, blank=True)
+    last_post_timestamp = models.DateTimeField(null=True, blank=True)
+    last_deletion_check = models.DateTimeField(null=True, blank=True)
+    # Hash of the signature, position and post count of the last scrape
+    profile_fingerprint = models.CharField(max_length=40, blank=True)
 
     class Meta:
         get_latest_by = 'date_updated'
@@ -352,6 +737,11 @@ class ForumProfile(models.Model):
         except self.DoesNotExist:
             before_save = None
         super(ForumProfile, self).save(*args, **kwargs)
+        # The sitewide stats count the active and verified profiles, the
+        # scrapes saving the profile don't change them
+        counted = (self.active, self.verified)
+        if before_save is None or counted != (before_save.active, before_save.verified):
+            caching.invalidate(*CACHE_DEPENDENCIES[ForumProfile])
         if not self.verification_code:
             hashids = Hashids(min_length=8, salt=settings.SECRET_KEY)
             forum_profile_id, forum_user_id = self.id, self.forum_user_id
@@ -386,6 +776,114 @@ class ForumProfile(models.Model):
         else:
             return self.date_verified
 
+    def deletion_check_due(self):
+        """
+        Whether the next posts scrape should read the whole 24 hours
+        window again to find deleted posts, instead of stopping at the
+        newest post seen before
+        """
+        if not self.last_deletion_check or not self.last_message_id:
+            return True
+        elapsed = timezone.now() - self.last_deletion_check
+        return elapsed.total_seconds() >= settings.POSTS_DELETION_CHECK_INTERVAL
+
+    def update_watermark(self, posts):
+        """
+        Moves the watermark to the newest of the scraped posts
+        :param posts: list of post details from the scraper
+        """
+        for post in posts:
+            message_id = int(post['message_id'])
+            if not self.last_message_id or message_id > self.last_message_id:
+                self.last_message_id = message_id
+                self.last_post_timestamp = post['timestamp'].replace(
+                    tzinfo=timezone.utc
+                )
+
+    def mature_posts(self):
+        """
+        Marks the posts older than the maturation period as matured
+        :return: number of posts that matured
+        """
+        dt_now = timezone.now()
+        cutoff = dt_now - timedelta(hours=config.MATURATION_PERIOD)
+        matured = self.posts.filter(
+            matured=False,
+            timestamp__lt=cutoff
+        ).update(matured=True, date_matured=dt_now)
+        if matured:
+            UserDailyStats.record({
+                self.user_profile_id: {'pending': -matured}
+            })
+        return matured
+
+    def mark_deleted_posts(self, since, message_ids):
+        """
+        Stops crediting and monitoring the posts that were not found
+        anymore in the posts scrape
+        :param since: start of the scraped window
+        :param message_ids: message IDs of the scraped posts
+        :return: number of posts marked as deleted
+        """
+        return ForumPost.uncredit(self.posts.filter(
+            matured=False,
+            timestamp__gte=since
+        ).exclude(
+            message_id__in=message_ids
+        ))
+
+    def track_signature_minutes(self):
+        """
+        Adds the minutes since the last scrape to the valid or invalid
+        signature minutes of all the posts that haven't matured yet,
+        depending on whether the signature was found in the profile page
+        :return: number of posts tracked
+        """
+        if not self.last_page_status:
+            return 0
+        current_status = self.last_page_status[-1]
+        invalidate = (
+            current_status.get('status_code') == 200 and
+            current_status.get('page_ok') and
+            not current_status.get('signature_found')
+        )
+        field = 'invalid_sig_minutes' if invalidate else 'valid_sig_minutes'
+        dt_now = timezone.now()
+        if self.last_scrape:
+            tdiff = dt_now - self.last_scrape
+            minutes = Value(int(tdiff.total_seconds() / 60))
+        else:
+            # First scrape, count the minutes since each post was made
+            minutes = RawSQL(
+                'FLOOR(EXTRACT(EPOCH FROM (%s - timestamp)) / 60)::integer',
+                (dt_now,)
+            )
+        return self.posts.filter(matured=False).update(
+            **{field: F(field) + minutes}
+        )
+
+    def schedule_next_scrape(self, active):
+        """
+        Sets when this profile is due for its next scrape. Active profiles,
+        with posts still being tracked for uptime or new posts, are scraped
+        every USER_SCRAPE_INTERVAL while the interval of dormant profiles
+        doubles up to USER_SCRAPE_INTERVAL_MAX. A random jitter keeps the
+        scrapes of the profiles spread over time.
+        :param active: whether the profile has recent activity
+        """
+        if active or not self.scrape_interval:
+            interval = settings.USER_SCRAPE_INTERVAL
+        else:
+            interval = min(
+                self.scrape_interval * 2,
+                settings.USER_SCRAPE_INTERVAL_MAX
+            )
+        self.scrape_interval = interval
+        jitter = random.uniform(-0.1, 0.1) * interval
+        self.next_scrape = timezone.now() + timedelta(
+            seconds=interval + jitter
+        )
+
     @property
     def total_posts(self):
         count = 0
@@ -450,10 +948,144 @@ class ForumPost(models.Model):
 
     class Meta:
         get_latest_by = 'timestamp'
+        unique_together = ('forum_profile', 'message_id')
 
     def __str__(self):
         return str(self.id)
 
+    @staticmethod
+    def credit_points(forum_rank):
+        """
+        Computes the points credited for a new post
+        :param forum_rank: ForumUserRank of the poster
+        :return: tuple of base points, bonus percentage, bonus points and
+            total points
+        """
+        base_points = config.POST_POINTS_MULTIPLIER
+        bonus_pct = forum_rank.bonus_percentage
+        influence_bonus = base_points * (float(bonus_pct) / 100)
+        total_points = base_points + influence_bonus
+        return (base_points, bonus_pct, influence_bonus, total_points)
+
+    @classmethod
+    def ingest(cls, forum_profile, posts):
+        """
+        Stores the new posts of a scrape with a single query, crediting
+        their points the same way `save` does. Posts that are already
+        stored are left untouched.
+        :param forum_profile: ForumProfile the posts were scraped from
+        :param posts: list of post details from the scraper
+        :return: number of posts inserted
+        """
+        campaign = Campaign.get_current()
+        if not campaign or not posts:
+            return 0
+        dt_now = timezone.now()
+        base_points, bonus_pct, influence_bonus, total_points = \
+            cls.credit_points(forum_profile.forum_rank)
+        rows = []
+        params = []
+        for post in posts:
+            # Bitcointalk uses UTC timestamps
+            timestamp = post['timestamp'].replace(tzinfo=timezone.utc)
+            # Only posts made during the current campaign are kept
+            if timestamp <= campaign.campaign_start:
+                continue
+            rows.append('(%s)' % ', '.join(['%s'] * 18))
+            params.extend([
+                uuid.uuid4(),
+                forum_profile.user_profile_id,
+                forum_profile.id,
+                forum_profile.forum_rank_id,
+                post['topic_id'],
+                post['message_id'],
+                post['content_length'],
+                timestamp,
+                True,  # monitoring
+                True,  # credited
+                False,  # matured
+                dt_now,  # date_credited
+                base_points,
+                bonus_pct,
+                influence_bonus,
+                total_points,
+                0,  # valid_sig_minutes
+                0  # invalid_sig_minutes
+            ])
+        if not rows:
+            return 0
+        query = """
+            INSERT INTO venue_forumpost (
+                id, user_profile_id, forum_profile_id, forum_rank_id,
+                topic_id, message_id, unique_content_length, timestamp,
+                monitoring, credited, matured, date_credited, base_points,
+                influence_bonus_pct, influence_bonus_pts, total_points,
+                valid_sig_minutes, invalid_sig_minutes
+            )
+            VALUES %s
+            ON CONFLICT (forum_profile_id, message_id) DO NOTHING
+            RETURNING id
+        """ % ', '.join(rows)
+        with connection.cursor() as c:
+            c.execute(query, params)
+            inserted = len(c.fetchall())
+        leaderboard.add_points({
+            forum_profile.user_profile_id: inserted * total_points
+        })
+        if inserted:
+            UserDailyStats.record({
+                forum_profile.user_profile_id: {
+                    'credited': inserted,
+                    'pending': inserted,
+                    'total': inserted
+                }
+            })
+            caching.invalidate(caching.POINTS)
+        return inserted
+
+    @classmethod
+    def uncredit(cls, posts):
+        """
+        Stops crediting and monitoring the posts, in one statement
+        :param posts: queryset of the posts to uncredit
+        :return: number of posts uncredited, the posts that were only
+            monitored are not counted
+        """
+        subquery, params = posts.values('pk').query.sql_with_params()
+        query = """
+            WITH TARGET AS (SELECT id, credited
+                            FROM venue_forumpost
+                            WHERE (credited OR monitoring) AND id IN (%s)
+                            FOR UPDATE),
+                 UNCREDITED AS (UPDATE venue_forumpost P
+                                SET credited = FALSE, monitoring = FALSE
+                                FROM TARGET T
+                                WHERE P.id = T.id
+                                RETURNING P.user_profile_id, P.total_points, P.date_credited,
+                                          T.credited AS was_credited)
+            SELECT user_profile_id, UP.user_id, date_credited :: DATE, count(*), sum(total_points)
+            FROM UNCREDITED
+              JOIN venue_userprofile UP ON UP.id = UNCREDITED.user_profile_id
+            WHERE was_credited
+            GROUP BY user_profile_id, UP.user_id, date_credited :: DATE
+        """ % subquery
+        with connection.cursor() as c:
+            c.execute(query, params)
+            rows = c.fetchall()
+        points = {}
+        for user_profile_id, _, _, _, total_points in rows:
+            points.setdefault(user_profile_id, 0)
+            points[user_profile_id] -= total_points
+        leaderboard.add_points(points)
+        if rows:
+            UserDailyStats.uncredit({
+                (user_profile_id, date): count
+                for user_profile_id, _, date, count, _ in rows if date
+            })
+            dashboard.drop(set([user_id for _, user_id, _, _, _ in rows]))
+            caching.invalidate(caching.POINTS)
+        return sum([count for _, _, _, count, _ in rows])
+
     def save(self, *args, **kwargs):
         # Process this post only if it's posted later than the
         # the start of the current campaign
@@ -461,10 +1093,8 @@ class ForumPost(models.Model):
         if campaign and self.timestamp > campaign.campaign_start:
             # Credit the points immediately
             if self._state.adding:
-                base_points = config.POST_POINTS_MULTIPLIER
-                bonus_pct = self.forum_profile.forum_rank.bonus_percentage
-                influence_bonus = base_points * (float(bonus_pct) / 100)
-                total_points = base_points + influence_bonus
+                base_points, bonus_pct, influence_bonus, total_points = \
+                    self.credit_points(self.forum_profile.forum_rank)
                 self.base_points = base_points
                 self.influence_bonus_pct = bonus_pct
                 self.influence_bonus_pts = influence_bonus
@@ -506,7 +1136,20 @@ class ForumPost(models.Model):
                         self.valid_sig_minutes += tdiff_minutes
                 except ForumPost.DoesNotExist:
                     pass
+            adding = self._state.adding
             super(ForumPost, self).save(*args, **kwargs)
+            if adding and self.credited:
+                leaderboard.add_points({
+                    self.user_profile_id: self.total_points
+                })
+            if adding:
+                UserDailyStats.record({
+                    self.user_profile_id: {
+                        'credited': int(self.credited),
+                        'pending': int(not self.matured),
+                        'total': 1
+                    }
+                })
 
 
 class Notification(models.Model):
@@ -563,8 +1206,79 @@ class Referral(models.Model):
 @receiver(models.signals.post_delete, sender=ForumProfile)
 @receiver(models.signals.post_delete, sender=ForumPost)
 def trigger_compute_ranking(*args, **kwargs):
-    job = celery.current_app.send_task(
-        'venue.tasks.compute_ranking',
-        queue='compute'
-    )
-    job.get()
+    # Deleting many rows at once ends up in a single recompute
+    transaction.on_commit(leaderboard.request_recompute)
+
+
+@receiver(models.signals.post_save, sender=User)
+@receiver(models.signals.post_delete, sender=User)
+@receiver(models.signals.post_save, sender=UserProfile)
+@receiver(models.signals.post_delete, sender=UserProfile)
+@receiver(models.signals.post_save, sender=ForumProfile)
+@receiver(models.signals.post_delete, sender=ForumProfile)
+@receiver(models.signals.post_save, sender=Referral)
+@receiver(models.signals.post_delete, sender=Referral)
+def drop_dashboard(sender, instance, **kwargs):
+    # The dashboard documents are keyed by user ID, see venue.dashboard
+    update_fields = kwargs.get('update_fields')
+    if update_fields and set(update_fields) <= {'last_login'}:
+        # Logging in changes nothing the dashboard shows
+        return
+    if sender is User:
+        dashboard.drop([instance.id])
+    elif sender is UserProfile:
+        dashboard.drop([instance.user_id])
+    elif sender is ForumProfile:
+        dashboard.drop(UserProfile.objects.filter(
+            id=instance.user_profile_id
+        ).values_list('user_id', flat=True))
+    else:
+        dashboard.drop(UserProfile.objects.filter(
+            id__in=[instance.referral_id, instance.referrer_id]
+        ).values_list('user_id', flat=True))
+
+
+# Model changes the cached data depends on, see venue.caching
+CACHE_DEPENDENCIES = {
+    ForumSite: (
+        caching.FORUM_SITES,
+        caching.FORUM_STATS,
+        caching.SIGNATURES,
+        caching.POINTS
+    ),
+    Signature: (caching.SIGNATURES,),
+    ForumUserRank: (caching.SIGNATURES, caching.POINTS),
+    Notification: (caching.NOTIFICATIONS,),
+    Campaign: (caching.CAMPAIGNS,),
+    ForumPost: (caching.POINTS,),
+    # The sitewide stats count the users with verified forum profiles,
+    # see ForumProfile.save for the changes
+    ForumProfile: (caching.POINTS,),
+    Signature.user_ranks.through: (caching.SIGNATURES,),
+    Notification.dismissed_by.through: (caching.NOTIFICATIONS,)
+}
+
+
+@receiver(models.signals.post_save, sender=ForumSite)
+@receiver(models.signals.post_delete, sender=ForumSite)
+@receiver(models.signals.post_save, sender=Signature)
+@receiver(models.signals.post_delete, sender=Signature)
+@receiver(models.signals.post_save, sender=ForumUserRank)
+@receiver(models.signals.post_delete, sender=ForumUserRank)
+@receiver(models.signals.post_save, sender=Notification)
+@receiver(models.signals.post_delete, sender=Notification)
+@receiver(models.signals.post_save, sender=Campaign)
+@receiver(models.signals.post_delete, sender=Campaign)
+@receiver(models.signals.post_save, sender=ForumPost)
+@receiver(models.signals.post_delete, sender=ForumPost)
+@receiver(models.signals.post_delete, sender=ForumProfile)
+@receiver(models.signals.m2m_changed, sender=Signature.user_ranks.through)
+@receiver(models.signals.m2m_changed, sender=Notification.dismissed_by.through)
+def invalidate_cache(sender, **kwargs):
+    caching.invalidate(*CACHE_DEPENDENCIES[sender])
+
+
+@receiver(config_updated)
+def invalidate_config_cache(*args, **kwargs):
+    # Any of the cached responses may contain config values
+    caching.invalidate(*caching.NAMESPACES)
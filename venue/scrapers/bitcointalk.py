@@ -1,18 +1,137 @@
+import hashlib
+import os
+from http.cookiejar import DefaultCookiePolicy
+
 import requests
-from requests.exceptions import ConnectionError
-from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
+from requests.exceptions import ConnectionError, Timeout
 from django.conf import settings
 from django.utils import timezone
 from datetime import datetime
 from dateutil import parser
 from .exceptions import ScraperError, ProfileDoesNotExist
+from .pagecache import PageCache
+from .parsers import get_parser
+from .ratelimit import RateLimiter
 
 logger = settings.LOGGER
 
+# HTTP session of the worker process and the ID of the process it was
+# created in, as the pooled connections can't be shared with the forks
+_session = None
+_session_pid = None
+
+
+def get_session():
+    """
+    Returns the HTTP session shared by the scrapers of this process, whose
+    connections are kept alive and reused across requests
+    """
+    global _session, _session_pid
+    if _session is None or _session_pid != os.getpid():
+        session = requests.Session()
+        # The profiles are fetched anonymously, keep no forum cookies
+        session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+        adapter = HTTPAdapter(
+            pool_connections=settings.SCRAPER_POOL_HOSTS,
+            pool_maxsize=settings.SCRAPER_MAX_CONNECTIONS_PER_HOST,
+            # Wait for a free connection rather than opening more
+            pool_block=True
+        )
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        _session, _session_pid = session, os.getpid()
+    return _session
+
+
+class ProfileSnapshot(object):
+    """ Compact record of the details extracted from a profile page """
+    __slots__ = (
+        'username',
+        'position',
+        'total_posts',
+        'signature_text',
+        'signature_links',
+        'page_ok'
+    )
+
+    def __init__(self):
+        self.username = None
+        self.position = None
+        self.total_posts = None
+        self.signature_text = None
+        self.signature_links = []
+        self.page_ok = False
+
+    def fingerprint(self, *extra):
+        """
+        Hash of the profile details that matter for the verification and
+        the ranking, so unchanged pages can be told apart cheaply
+        :param extra: other values that the verification depends on
+        :return: hex digest
+        """
+        parts = [
+            self.position,
+            self.total_posts,
+            self.signature_text,
+            sorted(self.signature_links),
+            self.page_ok
+        ]
+        parts.extend(extra)
+        data = '\x1f'.join(repr(x) for x in parts)
+        return hashlib.sha1(data.encode('utf-8')).hexdigest()
+
+
+def extract_profile(backend, document, response_text):
+    """
+    Walks the rows of the profile table once and collects everything that
+    the scraper needs from the page
+    :param backend: parser backend that parsed the document
+    :param document: parsed profile page
+    :param response_text: raw HTML of the profile page
+    :return: ProfileSnapshot object
+    """
+    snapshot = ProfileSnapshot()
+    rows = backend.profile_rows(document)
+    for index, row in enumerate(rows):
+        text = backend.text(row)
+        heading = text.strip()[0:10]
+        if index == 4:
+            try:
+                snapshot.total_posts = int(text.split()[-1])
+            except (IndexError, ValueError):
+                pass
+        if snapshot.username is None and 'Name' in heading:
+            text_list = text.split()
+            try:
+                name_index = text_list.index('Name:')
+                snapshot.username = text_list[name_index + 1]
+            except IndexError:
+                snapshot.username = ''
+        elif snapshot.position is None and 'Position' in heading:
+            try:
+                snapshot.position = backend.cell_text(row, 1).strip()
+            except IndexError:
+                snapshot.position = ''
+        elif snapshot.signature_text is None and 'Signature' in heading:
+            snapshot.signature_text = text
+            links = backend.links(row)
+            if not links:
+                links = text.strip().splitlines()
+            snapshot.signature_links = list(set(links))
+        if index >= 4 and snapshot.username is not None and \
+                snapshot.position is not None and \
+                snapshot.signature_text is not None:
+            break
+    if snapshot.signature_text is not None:
+        snapshot.page_ok = 'icons/profile_sm.gif' in response_text
+    return snapshot
+
 
 class BitcoinTalk(object):
 
-    def __init__(self, test=False, test_signature=None):
+    def __init__(self, test=False, test_signature=None,
+                 parser_backend=None):
         self.base_url = settings.BITCOINTALK_URL
         self.headers = {
             'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_12_6) '
@@ -22,7 +141,9 @@ class BitcoinTalk(object):
             'Referer': self.base_url
         }
         self.status_code = None
-        self.soup = None
+        self.parser = get_parser(parser_backend)
+        self.document = None
+        self.snapshot = None
         self.test = test
         self.test_signature = test_signature
         self.response_text = None
@@ -46,88 +167,146 @@ class BitcoinTalk(object):
         self.forum_user_id = forum_user_id
         self.expected_links = expected_links
 
-    def make_request(self, url, fallback=None, proxies=None, verify=True):
+    def make_request(self, url, fallback=None, proxies=None, verify=True,
+                     cache=None, refresh=False):
+        """
+        Fetches and parses a page
+        :param cache: PageCache to read the page from or store it in
+        :param refresh: whether to fetch the page even if it is cached,
+            replacing the cached one
+        """
+        def fetch_page():
+            return self.fetch(url, fallback=fallback, verify=verify)
+
+        if cache and refresh:
+            page = cache.refresh(fetch_page)
+        elif cache:
+            page = cache.fetch(fetch_page)
+        else:
+            page = fetch_page()
+        self.load_response(*page)
+
+    def fetch(self, url, fallback=None, verify=True):
+        """
+        Sends the request within the shared rate limit
+        :return: tuple of status code, text and content
+        """
+        limiter = RateLimiter.for_url(url, fallback)
+        limiter.acquire()
+        session = get_session()
         try:
             if fallback == 'crawlera':
                 # try to get data using crawlera proxies
                 proxies = settings.CRAWLERA_PROXIES
-                response = requests.get(
+                response = session.get(
                     url,
                     headers=self.headers,
                     proxies=proxies,
-                    verify=verify
+                    verify=verify,
+                    timeout=settings.SCRAPER_REQUEST_TIMEOUT
                 )
             else:
-                response = requests.get(
+                response = session.get(
                     url,
                     headers=self.headers,
                     proxies=None,
-                    verify=verify
+                    verify=verify,
+                    timeout=settings.SCRAPER_REQUEST_TIMEOUT
                 )
-            if response.status_code != 200:
-                self.error_info['status_code'] = response.status_code
-                self.error_info['response_text'] = response.text
-                raise ScraperError('HTTP response not ok', self.error_info)
-        except ConnectionError as exc:
+        except (ConnectionError, Timeout) as exc:
             self.error_info = {
                 'message': repr(exc)
             }
             raise ScraperError('HTTP request failed', self.error_info)
-        self.response_text = response.text
-        self.status_code = response.status_code
+        limiter.update(response.status_code)
+        return (response.status_code, response.text, response.content)
+
+    def load_response(self, status_code, text, content):
+        self.response_text = text
+        self.status_code = status_code
         self.error_info['status_code'] = self.status_code
-        self.error_info['response_text'] = self.response_text
         if self.status_code != 200:
+            self.error_info['response_text'] = self.response_text
             raise ScraperError('HTTP response not ok', self.error_info)
-        self.soup = BeautifulSoup(response.content, 'html.parser')
+        self.document = self.parser.parse(content)
 
-    def get_profile(self, user_id, fallback=None, test_config=None):
+    def load_snapshot(self):
+        """
+        Extracts the profile details, then drops the parsed tree and the
+        raw HTML so they are not kept around for the scraper's lifetime
+        """
+        self.snapshot = extract_profile(
+            self.parser,
+            self.document,
+            self.response_text
+        )
+        if self.snapshot.username is None or self.snapshot.position is None:
+            # Keep the page for the error reports of the failed lookups
+            self.error_info['response_text'] = self.response_text
+        self.document = None
+        self.response_text = None
+
+    def profile_url(self, user_id, test_config=None):
+        if test_config:
+            return test_config['profile_url']
         profile_url = self.base_url + '/index.php?action=profile;u='
         profile_url += str(user_id)
-        self.error_info['fallback'] = fallback
+        return profile_url
+
+    def posts_url(self, user_id):
+        url = self.base_url + '/index.php?action=profile;u=%s;' % user_id
+        url += 'sa=showPosts;start=0'
+        return url
+
+    def profile_cache(self, user_id, test_config=None):
+        # Test pages are not shared
         if test_config:
-            profile_url = test_config['profile_url']
+            return None
+        return PageCache('bitcointalk', user_id)
+
+    def get_profile(self, user_id, fallback=None, test_config=None,
+                    use_cache=True):
+        """
+        Fetches and parses the profile page
+        :param use_cache: whether a page fetched a moment ago may be used,
+            the signature verification needs the page as it is now. The
+            fetched page is cached either way.
+        """
+        self.error_info['fallback'] = fallback
+        profile_url = self.profile_url(user_id, test_config=test_config)
         # Send request and parse result
-        self.make_request(profile_url, fallback=fallback, verify=False)
-        body_area = self.soup.find('div', {'id': 'bodyarea'})
-        if body_area:
-            body_text = body_area.text
+        self.make_request(
+            profile_url,
+            fallback=fallback,
+            verify=False,
+            cache=self.profile_cache(user_id, test_config),
+            refresh=not use_cache
+        )
+        self.check_profile_exists()
+        self.load_snapshot()
+
+    def check_profile_exists(self):
+        body_area = self.parser.body_area(self.document)
+        if body_area is not None:
+            body_text = self.parser.text(body_area)
             # Check if profile exists in the forum site
             if 'The user whose profile you are trying to view does not exist.' in body_text:
                 raise ProfileDoesNotExist('Profile does not exist', self.error_info)
 
     def get_total_posts(self):
-        row = self.soup.select('div#bodyarea tr')[4]
-        return int(row.text.split()[-1])
+        if self.snapshot.total_posts is None:
+            raise ScraperError('Cannot get total posts', self.error_info)
+        return self.snapshot.total_posts
 
     def get_user_position(self):
-        try:
-            rows = self.soup.select('div#bodyarea tr')
-            found = False
-            for row in rows:
-                if 'Position' in row.text.strip()[0:10]:
-                    found = True
-                    pos_td = row.find_all('td')[1]
-                    return pos_td.text.strip()
-            if not found:
-                raise ScraperError('Cannot get user position', self.error_info)
-        except IndexError:
-            return ''
+        if self.snapshot.position is None:
+            raise ScraperError('Cannot get user position', self.error_info)
+        return self.snapshot.position
 
     def get_username(self):
-        try:
-            rows = self.soup.select('div#bodyarea tr')
-            found = False
-            for row in rows:
-                if 'Name' in row.text.strip()[0:10]:
-                    found = True
-                    text_list = row.text.split()
-                    name_index = text_list.index('Name:')
-                    return text_list[name_index + 1]
-            if not found:
-                raise ScraperError('Cannot get username', self.error_info)
-        except IndexError:
-            return ''
+        if self.snapshot.username is None:
+            raise ScraperError('Cannot get username', self.error_info)
+        return self.snapshot.username
 
     def verify_links(self,
                      scraped_links,
@@ -156,7 +335,7 @@ class BitcoinTalk(object):
                 # links = []
                 # for link in scraped_links:
                 #     try:
-                #         if 'vcode=' in link: 
+                #         if 'vcode=' in link:
                 #             clean_link, vcode = link.split('vcode=')
                 #             vcode = vcode.split('&')[0]
                 #         else:
@@ -170,37 +349,13 @@ class BitcoinTalk(object):
         return (verified, vcode)
 
     def check_signature(self, vcode=None):
-        sig = None
-        page_ok = False
-        if 'icons/profile_sm.gif' in self.response_text:
-            page_ok = True
-        try:
-            rows = self.soup.select('div#bodyarea tr')
-            found = False
-            for row in rows:
-                if 'Signature' in row.text.strip()[0:10]:
-                    found = True
-                    sig = row
-                    break
-            if not found:
-                page_ok = False
-        except IndexError:
-            pass
-        if sig:
-            # Find links and check their integrity
-            links = sig.find_all('a')
-            if links:
-                links = [x.attrs['href'] for x in links]
-            else:
-                links = sig.text.strip().splitlines()
-            if links:
-                links = list(set(links))
-            else:
-                links = []
+        page_ok = self.snapshot.page_ok
+        if self.snapshot.signature_text is not None:
+            # Check the integrity of the links in the signature
             links_verified, scraped_vcode = self.verify_links(
-                links,
+                self.snapshot.signature_links,
                 self.expected_links,
-                scraped_signature=sig.text
+                scraped_signature=self.snapshot.signature_text
             )
             code_verified = False
             if self.test:
@@ -218,19 +373,26 @@ class BitcoinTalk(object):
             sig_found = False
         return (page_ok, sig_found)
 
-    def _scrape_posts_page(self, soup, start=None, **kwargs):
+    def _scrape_posts_page(self, document, start=None, last_message_id=None,
+                           last_timestamp=None, **kwargs):
+        """
+        Collects the posts of a posts page, newest first
+        :param start: oldest post timestamp to collect
+        :param last_message_id: highest message ID seen in earlier scrapes
+        :param last_timestamp: timestamp of that message
+        :return: tuple of the post details and whether the start or the
+            already seen posts have been reached
+        """
         post_details = []
-        posts = soup.select('.post')
+        posts = self.parser.posts(document)
         check_datetime = timezone.now()
         start_reached = False
         for post in posts:
-            header = post.parent.parent.parent.select('tr')[0]
-            title = header.select('td')[1]
-            post_link = title.select('a')[-1].attrs['href']
+            post_link, date = self.parser.post_header(post)
             topic_id = post_link.split('topic=')[-1].split('.')[0]
             message_id = post_link.split('topic=')[-1].split('#')[-1]
             message_id = message_id.replace('msg', '')
-            date = header.select('td')[2].text.strip().replace('on: ', '')
+            date = date.strip().replace('on: ', '')
             if 'Today ' in date:
                 date = date.strip().replace('Today at ', '')
                 timestamp = datetime.combine(
@@ -239,20 +401,17 @@ class BitcoinTalk(object):
                 )
             else:
                 timestamp = parser.parse(date)
+            if last_message_id and int(message_id) <= last_message_id or \
+                    last_timestamp and timestamp < last_timestamp:
+                # Everything from here on was seen in an earlier scrape
+                start_reached = True
+                break
             if timestamp >= start:
-                # if message_id in tracked_posts:
-                # Remove all the elements with inside quotes
-                for div in post.find_all("div", {'class': 'quoteheader'}):
-                    div.decompose()
-                for div in post.find_all("div", {'class': 'quote'}):
-                    div.decompose()
-                # Get the cleaned up text
-                clean_content = post.text.strip()
                 details = {
                     'topic_id': topic_id,
                     'message_id': message_id,
                     'timestamp': timestamp,
-                    'content_length': len(clean_content),
+                    'content_length': self.parser.content_length(post),
                     'check_datetime': check_datetime
                 }
                 post_details.append(details)
@@ -260,32 +419,42 @@ class BitcoinTalk(object):
                 start_reached = True
         return (post_details, start_reached)
 
+    def get_posts_pages(self):
+        return self.parser.nav_pages(self.document)
+
+    def posts_parsing_error(self, user_id, exc):
+        message = 'Error in parsing forum posts of forum user ID '
+        message += user_id
+        self.error_info['status_code'] = self.status_code
+        self.error_info['reponse_text'] = self.response_text
+        self.error_info['message'] = repr(exc)
+        return ScraperError(message, self.error_info)
+
     def scrape_posts(self, user_id, **kwargs):
-        url = self.base_url + '/index.php?action=profile;u=%s;' % user_id
-        url += 'sa=showPosts;start=0'
-        self.make_request(url, fallback=kwargs.get('fallback'), verify=False)
+        fallback = kwargs.get('fallback')
+        self.make_request(
+            self.posts_url(user_id),
+            fallback=fallback,
+            verify=False
+        )
         try:
-            pages = self.soup.select('.navPages')
-            pages = [x.attrs['href'] for x in pages]
-            posts, start_reached = self._scrape_posts_page(self.soup, **kwargs)
-            if not start_reached:
-                for page in pages:
-                    resp = requests.get(page)
-                    soup = BeautifulSoup(resp.content, 'html.parser')
-                    posts, start_reached = self._scrape_posts_page(
-                        soup,
-                        **kwargs
-                    )
-                    if start_reached:
-                        break
+            pages = self.get_posts_pages()
+            posts, start_reached = self._scrape_posts_page(
+                self.document,
+                **kwargs
+            )
+            for page in pages:
+                if start_reached:
+                    break
+                self.make_request(page, fallback=fallback, verify=False)
+                page_posts, start_reached = self._scrape_posts_page(
+                    self.document,
+                    **kwargs
+                )
+                posts.extend(page_posts)
             return posts
         except (IndexError, TypeError) as exc:
-            message = 'Error in parsing forum posts of forum user ID '
-            message += user_id
-            self.error_info['status_code'] = self.status_code
-            self.error_info['reponse_text'] = self.response_text
-            self.error_info['message'] = repr(exc)
-            raise ScraperError(message, self.error_info)
+            raise self.posts_parsing_error(user_id, exc)
 
 
 def verify_and_scrape(forum_profile_id,
@@ -295,31 +464,61 @@ def verify_and_scrape(forum_profile_id,
                       test_mode=False,
                       test_signature=None,
                       fallback=None,
-                      test_config=None):
+                      test_config=None,
+                      last_fingerprint=None,
+                      use_cache=True):
     scraper = BitcoinTalk(test=test_mode, test_signature=test_signature)
     scraper.set_params(forum_profile_id, forum_user_id, expected_links)
     scraper.get_profile(
         forum_user_id,
         fallback=fallback,
-        test_config=test_config
+        test_config=test_config,
+        use_cache=use_cache
     )
+    return profile_results(
+        scraper,
+        vcode=vcode,
+        fallback=fallback,
+        last_fingerprint=last_fingerprint
+    )
+
+
+def profile_results(scraper, vcode=None, fallback=None,
+                    last_fingerprint=None):
+    """
+    Collects the results of a profile scrape
+    :param last_fingerprint: fingerprint of the profile from the last
+        scrape, the signature is not verified again if it still matches
+    :return: tuple of status code, page ok, signature verified, total
+        posts, username, position, fallback and the profile fingerprint.
+        Page ok and signature verified are None for unchanged profiles.
+    """
     try:
         username = scraper.get_username()
         position = scraper.get_user_position()
-        page_ok, verified = scraper.check_signature(vcode=vcode)
+        fingerprint = scraper.snapshot.fingerprint(
+            scraper.expected_links,
+            vcode,
+            scraper.test,
+            scraper.test_signature
+        )
+        if fingerprint == last_fingerprint:
+            page_ok, verified = None, None
+        else:
+            page_ok, verified = scraper.check_signature(vcode=vcode)
     except ScraperError as exc:
         # Send log to LogDNA
         log_opts = {
             'level': 'error',
             'meta': {
-                'forum_profile_id': str(forum_profile_id),
-                'forum_user_id': forum_user_id,
+                'forum_profile_id': str(scraper.forum_profile_id),
+                'forum_user_id': scraper.forum_user_id,
                 'response_status_code': scraper.status_code,
                 'message': exc.info.get('message')
             }
         }
         message = 'Error in scraping profile details from forum user ID '
-        message += str(forum_profile_id)
+        message += str(scraper.forum_profile_id)
         logger.info(message, log_opts)
         raise ScraperError(message, exc.info)
     posts = scraper.get_total_posts()
@@ -330,7 +529,8 @@ def verify_and_scrape(forum_profile_id,
         posts,
         username,
         position,
-        fallback
+        fallback,
+        fingerprint
     )
     return data
 
@@ -370,16 +570,20 @@ def scrape_posts(forum_user_id, **kwargs):
         posts = scraper.scrape_posts(forum_user_id, **kwargs)
         return posts
     except ScraperError as exc:
-        # Send log to LogDNA
-        log_opts = {
-            'level': 'error',
-            'meta': {
-                'forum_user_id': forum_user_id,
-                'response_status_code': exc.info.get('status_code'),
-                'message': exc.info.get('message')
-            }
+        raise posts_scraping_error(forum_user_id, exc)
+
+
+def posts_scraping_error(forum_user_id, exc):
+    # Send log to LogDNA
+    log_opts = {
+        'level': 'error',
+        'meta': {
+            'forum_user_id': forum_user_id,
+            'response_status_code': exc.info.get('status_code'),
+            'message': exc.info.get('message')
         }
-        message = 'Error in scraping forum posts of forum user ID '
-        message += forum_user_id
-        logger.info(message, log_opts)
-        raise ScraperError(message, exc.info)
+    }
+    message = 'Error in scraping forum posts of forum user ID '
+    message += forum_user_id
+    logger.info(message, log_opts)
+    return ScraperError(message, exc.info)
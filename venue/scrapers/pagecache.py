@@ -0,0 +1,151 @@
+"""
+Short lived cache of forum profile pages
+
+Onboarding looks up the same profile several times within a minute
+(position check, signature verification, first scrape), usually from
+different workers. Profile pages are kept compressed in Redis for up to
+a minute, and concurrent lookups of the same page are coalesced so only
+one request goes out to the forum while the others wait for its result.
+"""
+
+import time
+import uuid
+import zlib
+
+from django.conf import settings
+from redis.exceptions import RedisError
+
+logger = settings.LOGGER
+
+# Deletes the lock only if it is still held by the same owner
+RELEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+release_script = settings.REDIS_DB.register_script(RELEASE_SCRIPT)
+
+# Interval between the checks of a waiting lookup, in seconds
+POLL_INTERVAL = 0.1
+
+# The forums are served as ISO-8859-1, which also decodes any byte string
+PAGE_ENCODING = 'ISO-8859-1'
+
+
+class PageCache(object):
+    """ Cached and coalesced fetching of one forum profile page
+
+        cache = PageCache('bitcointalk', forum_user_id)
+        status_code, text, content = cache.fetch(fetch_page)
+    """
+
+    def __init__(self, forum, forum_user_id):
+        self.key = 'scraper_page:%s:%s' % (forum, forum_user_id)
+        self.lock_key = self.key + ':lock'
+        self.ttl = settings.SCRAPER_PAGE_CACHE_TTL
+        self.lock_timeout = settings.SCRAPER_REQUEST_TIMEOUT + 5
+        self.token = None
+
+    def get(self):
+        """
+        :return: tuple of status code, text and content, or None on a miss
+        """
+        compressed = settings.REDIS_BINARY_DB.get(self.key)
+        if compressed is None:
+            return None
+        content = zlib.decompress(compressed)
+        return (200, content.decode(PAGE_ENCODING), content)
+
+    def set(self, page):
+        status_code, _, content = page
+        # Only proper pages are worth sharing
+        if status_code == 200:
+            settings.REDIS_BINARY_DB.setex(
+                self.key,
+                self.ttl,
+                zlib.compress(content)
+            )
+
+    def lock(self):
+        self.token = uuid.uuid4().hex
+        return settings.REDIS_DB.set(
+            self.lock_key,
+            self.token,
+            nx=True,
+            ex=self.lock_timeout
+        )
+
+    def release(self):
+        release_script(keys=[self.lock_key], args=[self.token])
+
+    def locked(self):
+        return settings.REDIS_DB.exists(self.lock_key)
+
+    def fetch(self, fetch_page):
+        """
+        Returns the cached page, or fetches it if no other lookup is
+        already doing so
+        :param fetch_page: function fetching the page, returning a tuple
+            of status code, text and content
+        """
+        try:
+            page = self.get()
+            if page:
+                return page
+            owner = self.lock()
+        except RedisError as exc:
+            logger.warning('Scraper page cache unavailable: %r' % exc)
+            return fetch_page()
+        if owner:
+            try:
+                page = fetch_page()
+                self._store(page)
+            finally:
+                self._release()
+            return page
+        # Another lookup is fetching the same page, wait for its result
+        deadline = time.time() + self.lock_timeout
+        while time.time() < deadline:
+            time.sleep(POLL_INTERVAL)
+            page = self._poll()
+            if page:
+                return page
+            if page is False:
+                break
+        return fetch_page()
+
+    def refresh(self, fetch_page):
+        """
+        Fetches the page without reading the cached one, then caches it
+        for the lookups that follow
+        """
+        page = fetch_page()
+        self._store(page)
+        return page
+
+    def _store(self, page):
+        try:
+            self.set(page)
+        except RedisError as exc:
+            logger.warning('Scraper page cache unavailable: %r' % exc)
+
+    def _release(self):
+        try:
+            self.release()
+        except RedisError as exc:
+            logger.warning('Scraper page cache unavailable: %r' % exc)
+
+    def _poll(self):
+        """
+        :return: the page once cached, False when the other lookup gave up
+            without caching it, or None to keep waiting
+        """
+        try:
+            page = self.get()
+            if page:
+                return page
+            return None if self.locked() else False
+        except RedisError:
+            return False
@@ -0,0 +1,148 @@
+"""
+HTML parser backends for the forum scrapers
+
+Every backend exposes the same small set of lookups that the scrapers
+need, so the parsing library can be switched with the
+`SCRAPER_PARSER_BACKEND` setting. The BeautifulSoup backend is the
+reference implementation, the other backends must give identical output.
+"""
+
+import lxml.etree
+import lxml.html
+from bs4 import BeautifulSoup
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+from .exceptions import ScraperError
+
+QUOTE_CLASSES = {'quoteheader', 'quote'}
+
+
+class BeautifulSoupParser(object):
+    """ Reference backend using BeautifulSoup with html.parser """
+
+    def parse(self, content):
+        return BeautifulSoup(content, 'html.parser')
+
+    def text(self, node):
+        return node.text
+
+    def body_area(self, document):
+        return document.find('div', {'id': 'bodyarea'})
+
+    def profile_rows(self, document):
+        return document.select('div#bodyarea tr')
+
+    def cell_text(self, row, index):
+        return row.find_all('td')[index].text
+
+    def links(self, node):
+        return [x.attrs['href'] for x in node.find_all('a')]
+
+    def nav_pages(self, document):
+        return [x.attrs['href'] for x in document.select('.navPages')]
+
+    def posts(self, document):
+        return document.select('.post')
+
+    def post_header(self, post):
+        """
+        :return: tuple of the post link and the date text of a post
+        """
+        header = post.parent.parent.parent.select('tr')[0]
+        cells = header.select('td')
+        post_link = cells[1].select('a')[-1].attrs['href']
+        return (post_link, cells[2].text)
+
+    def content_length(self, post):
+        # Remove all the elements with inside quotes
+        for div in post.find_all('div', {'class': 'quoteheader'}):
+            div.decompose()
+        for div in post.find_all('div', {'class': 'quote'}):
+            div.decompose()
+        # Get the cleaned up text
+        return len(post.text.strip())
+
+
+class LxmlParser(object):
+    """ C-accelerated backend using lxml """
+
+    def parse(self, content):
+        try:
+            return lxml.html.fromstring(content)
+        except lxml.etree.ParserError as exc:
+            # Empty or blank pages
+            raise ScraperError('Cannot parse the page', {'message': str(exc)})
+
+    def text(self, node):
+        return node.text_content()
+
+    def body_area(self, document):
+        nodes = document.xpath('//div[@id="bodyarea"]')
+        return nodes[0] if nodes else None
+
+    def profile_rows(self, document):
+        return document.xpath('//div[@id="bodyarea"]//tr')
+
+    def cell_text(self, row, index):
+        return row.xpath('.//td')[index].text_content()
+
+    def links(self, node):
+        return [x.attrib['href'] for x in node.xpath('.//a')]
+
+    def nav_pages(self, document):
+        nodes = document.xpath(self._class_xpath('navPages'))
+        return [x.attrib['href'] for x in nodes]
+
+    def posts(self, document):
+        return document.xpath(self._class_xpath('post'))
+
+    def post_header(self, post):
+        header = post.getparent().getparent().getparent().xpath('.//tr')[0]
+        cells = header.xpath('.//td')
+        post_link = cells[1].xpath('.//a')[-1].attrib['href']
+        return (post_link, cells[2].text_content())
+
+    def content_length(self, post):
+        # Collect the text outside of quotes without touching the tree
+        pieces = []
+        self._collect_text(post, pieces)
+        return len(''.join(pieces).strip())
+
+    def _collect_text(self, node, pieces):
+        if node.text:
+            pieces.append(node.text)
+        for child in node:
+            # Comments and processing instructions have no string tag
+            if isinstance(child.tag, str) and not self._is_quote(child):
+                self._collect_text(child, pieces)
+            if child.tail:
+                pieces.append(child.tail)
+
+    def _is_quote(self, node):
+        if node.tag != 'div':
+            return False
+        classes = set(node.get('class', '').split())
+        return bool(classes & QUOTE_CLASSES)
+
+    def _class_xpath(self, class_name):
+        return '//*[contains(concat(" ", normalize-space(@class), " "), " %s ")]' % class_name
+
+
+PARSER_BACKENDS = {
+    'beautifulsoup': BeautifulSoupParser,
+    'lxml': LxmlParser
+}
+
+
+def get_parser(name=None):
+    """
+    Returns an instance of a parser backend
+    :param name: backend name, defaults to the SCRAPER_PARSER_BACKEND setting
+    :return: parser backend object
+    """
+    name = name or settings.SCRAPER_PARSER_BACKEND
+    try:
+        return PARSER_BACKENDS[name]()
+    except KeyError:
+        raise ImproperlyConfigured('Unknown scraper parser backend: %s' % name)
@@ -0,0 +1,170 @@
+"""
+Shared rate limiter for the scraper fetches
+
+All the workers draw from one token bucket in Redis per forum host and
+egress path (direct or through Crawlera), so the total traffic to a forum
+stays under a single global rate however many workers are running. The
+bucket is updated by Lua scripts so concurrent workers never race, and its
+rate adapts to the forum: it is halved when the forum answers with a
+throttling status and creeps back up towards the configured maximum with
+every successful fetch.
+"""
+
+import time
+from urllib.parse import urlparse
+
+from django.conf import settings
+from redis.exceptions import RedisError
+
+from .exceptions import ScraperError
+
+logger = settings.LOGGER
+
+# Statuses the forums answer with when we are going too fast
+THROTTLE_STATUSES = (403, 429, 503)
+
+# Takes a token from the bucket, or reserves the next one if the bucket is
+# empty. Returns the number of seconds to wait before fetching, or -1 if
+# the wait would be longer than the allowed maximum.
+RESERVE_SCRIPT = """
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated', 'rate')
+local now = tonumber(ARGV[1])
+local max_rate = tonumber(ARGV[2])
+local burst = tonumber(ARGV[3])
+local max_wait = tonumber(ARGV[4])
+local rate = math.min(tonumber(state[3]) or max_rate, max_rate)
+local tokens = tonumber(state[1]) or burst
+local updated = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(now - updated, 0) * rate)
+local wait = 0
+if tokens < 1 then
+    wait = (1 - tokens) / rate
+    if wait > max_wait then
+        return '-1'
+    end
+end
+redis.call('HMSET', KEYS[1], 'tokens', tokens - 1, 'updated', now, 'rate', rate)
+redis.call('EXPIRE', KEYS[1], ARGV[5])
+return tostring(wait)
+"""
+
+# Multiplicative decrease on throttling, additive increase on success
+ADJUST_SCRIPT = """
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'rate')
+local max_rate = tonumber(ARGV[2])
+local min_rate = tonumber(ARGV[3])
+local rate = math.min(tonumber(state[2]) or max_rate, max_rate)
+if ARGV[1] == 'throttled' then
+    rate = math.max(rate * tonumber(ARGV[4]), min_rate)
+    -- Drop the saved up tokens so the back off starts right away
+    local tokens = math.min(tonumber(state[1]) or 0, 0)
+    redis.call('HSET', KEYS[1], 'tokens', tokens)
+else
+    rate = math.min(rate + max_rate * tonumber(ARGV[5]), max_rate)
+end
+redis.call('HSET', KEYS[1], 'rate', rate)
+redis.call('EXPIRE', KEYS[1], ARGV[6])
+return tostring(rate)
+"""
+
+reserve_script = settings.REDIS_DB.register_script(RESERVE_SCRIPT)
+adjust_script = settings.REDIS_DB.register_script(ADJUST_SCRIPT)
+
+
+class RateLimiter(object):
+    """ Token bucket shared by all the workers fetching from a forum host
+
+        limiter = RateLimiter.for_url(url, fallback)
+        limiter.acquire()
+        response = requests.get(url)
+        limiter.update(response.status_code)
+    """
+
+    def __init__(self, host, egress='direct'):
+        self.host = host
+        self.egress = egress
+        self.key = 'scraper_rate_limit:%s:%s' % (host, egress)
+        self.max_rate = float(settings.SCRAPER_RATE_LIMITS[egress])
+        self.min_rate = float(settings.SCRAPER_RATE_LIMIT_MIN)
+        self.burst = settings.SCRAPER_RATE_LIMIT_BURST
+        self.max_wait = settings.SCRAPER_RATE_LIMIT_MAX_WAIT
+
+    @classmethod
+    def for_url(cls, url, fallback=None):
+        egress = 'crawlera' if fallback == 'crawlera' else 'direct'
+        return cls(urlparse(url).netloc, egress)
+
+    def reserve(self):
+        """
+        Takes a slot from the shared bucket
+        :return: number of seconds to wait before sending the request
+        """
+        try:
+            wait = float(reserve_script(
+                keys=[self.key],
+                args=[
+                    time.time(),
+                    self.max_rate,
+                    self.burst,
+                    self.max_wait,
+                    settings.SCRAPER_RATE_LIMIT_TTL
+                ]
+            ))
+        except RedisError as exc:
+            # Do not stop scraping altogether when Redis is unavailable
+            logger.warning('Scraper rate limiter unavailable: %r' % exc)
+            return 0
+        if wait < 0:
+            raise ScraperError('Rate limit wait too long', {
+                'message': 'No fetch slot for %s (%s) within %s seconds' % (
+                    self.host, self.egress, self.max_wait
+                ),
+                'fallback': self.egress if self.egress != 'direct' else None
+            })
+        return wait
+
+    def acquire(self):
+        time.sleep(self.reserve())
+
+    def update(self, status_code):
+        """
+        Adjusts the shared rate according to the response of the forum
+        :param status_code: HTTP status code of the response
+        """
+        if status_code in THROTTLE_STATUSES:
+            outcome = 'throttled'
+        elif status_code == 200:
+            outcome = 'ok'
+        else:
+            return
+        try:
+            rate = float(adjust_script(
+                keys=[self.key],
+                args=[
+                    outcome,
+                    self.max_rate,
+                    self.min_rate,
+                    settings.SCRAPER_RATE_LIMIT_DECREASE,
+                    settings.SCRAPER_RATE_LIMIT_INCREASE,
+                    settings.SCRAPER_RATE_LIMIT_TTL
+                ]
+            ))
+        except RedisError as exc:
+            logger.warning('Scraper rate limiter unavailable: %r' % exc)
+            return
+        if outcome == 'throttled':
+            log_opts = {
+                'level': 'warning',
+                'meta': {
+                    'host': self.host,
+                    'egress': self.egress,
+                    'status_code': status_code,
+                    'rate': rate
+                }
+            }
+            logger.info('Scraper throttled, lowering the fetch rate', log_opts)
+
+    def get_rate(self):
+        """ Current shared rate in requests per second """
+        rate = settings.REDIS_DB.hget(self.key, 'rate')
+        return min(float(rate), self.max_rate) if rate else self.max_rate
@@ -1,11 +1,11 @@
 from __future__ import absolute_import, unicode_literals
 
 import re
+import math
 import uuid
 import time
-from pytz import UTC
 from datetime import timedelta
-from operator import itemgetter
+from urllib.parse import urlparse
 
 import rollbar
 from celery import chord, shared_task
@@ -13,20 +13,33 @@ from celery.result import AsyncResult
 from celery.signals import task_failure
 from constance import config
 from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import Max, Q
 from django.template.loader import get_template
 from django.utils import timezone
 from postmarker.core import PostmarkClient
 from ws4redis.publisher import RedisPublisher
 from ws4redis.redis_store import RedisMessage
 from venue.scrapers.exceptions import ProfileDoesNotExist, ScraperError
+from venue.scrapers.ratelimit import RateLimiter
 from celery.exceptions import MaxRetriesExceededError
 
 from venue.models import (ForumPost, ForumProfile, ForumSite, ForumUserRank,
-                          Ranking, Signature, UserProfile, Campaign)
+                          Ranking, Signature, UserProfile, UserDailyStats,
+                          Campaign)
 from venue.utils import translation_on
+from venue import background, leaderboard
 
 logger = settings.LOGGER
 
+# Kind of the background forum profile lookups
+PROFILE_LOOKUP = 'profile_lookup'
+SIGNATURE_VERIFICATION = 'signature_verification'
+
+# Number of dashboards rebuilt per task after a ranking
+DASHBOARD_REFRESH_CHUNK = 100
+
 
 @task_failure.connect
 def handle_task_failure(**kw):
@@ -106,104 +119,89 @@ def scrape_forum_profile(self, forum_profile_id, test_mode=None,
             test_mode=test_mode,
             test_signature=forum_profile.signature.test_signature,
             fallback=fallback,
-            test_config=test_scrape_config)
+            test_config=test_scrape_config,
+            last_fingerprint=forum_profile.profile_fingerprint or None)
         if test_scrape_config:
             return results
         else:
-            status_code, page_ok, signature_found, total_posts, _, position, fallback = results
-            # Update forum profile page status
-            status_list = forum_profile.last_page_status
-            if len(status_list):
-                old_status = status_list[-1]
-                new_status_list = [old_status]
-            else:
-                new_status_list = []
-            new_status = {
-                'status_code': status_code,
-                'page_ok': page_ok,
-                'signature_found': signature_found
-            }
-            new_status_list.append(new_status)
-            forum_profile.last_page_status = new_status_list
-            forum_profile.save()
-            # Update the forum user rank, if it changed
-            forum_rank = ForumUserRank.objects.get(name=position)
-            if forum_profile.forum_rank != forum_rank:
-                forum_profile.forum_rank = forum_rank
+            status_code, page_ok, signature_found, total_posts, _, position, fallback, fingerprint = results
+            # The signature, position and post count are the same as in
+            # the last scrape, so the page status and rank still hold
+            unchanged = fingerprint == forum_profile.profile_fingerprint
+            signature_changed = False
+            if not unchanged:
+                # Update forum profile page status
+                status_list = forum_profile.last_page_status
+                if len(status_list):
+                    old_status = status_list[-1]
+                    new_status_list = [old_status]
+                    signature_changed = \
+                        old_status.get('signature_found') != signature_found
+                else:
+                    new_status_list = []
+                new_status = {
+                    'status_code': status_code,
+                    'page_ok': page_ok,
+                    'signature_found': signature_found
+                }
+                new_status_list.append(new_status)
+                forum_profile.last_page_status = new_status_list
+                # Update the forum user rank, if it changed
+                forum_rank = ForumUserRank.objects.get(name=position)
+                if forum_profile.forum_rank != forum_rank:
+                    forum_profile.forum_rank = forum_rank
+                forum_profile.profile_fingerprint = fingerprint
                 forum_profile.save()
             # Get the current last scrape timestamp
             last_scrape = forum_profile.get_last_scrape()
 
-            # Check posts that haven't reached maturatation
-            tracked_posts = []
-            for post in forum_profile.posts.filter(matured=False):
-                # Check if it's not due to mature yet
-                post_timestamp = post.timestamp.replace(tzinfo=None)
-                tdiff = timezone.now().replace(tzinfo=None) - post_timestamp
-                tdiff_hours = tdiff.total_seconds() / 3600
-                if tdiff_hours > config.MATURATION_PERIOD:
-                    post.matured = True
-                    post.date_matured = timezone.now()
-                    post.save()
-                else:
-                    tracked_posts.append(post.message_id)
+            # Mark the posts that reached the maturation period
+            forum_profile.mature_posts()
             # Get the latest posts from this forum profile
             # Latest means posts in the last 24 hours since
             # the last scrape
             posts_scrape_start = last_scrape - timedelta(hours=24)
+            # Between the deletion checks, which read the whole window,
+            # stop at the newest post seen in the previous scrapes
+            deletion_check = forum_profile.deletion_check_due()
+            watermark = {}
+            if not deletion_check:
+                watermark = {
+                    'last_message_id': forum_profile.last_message_id,
+                    'last_timestamp': forum_profile.last_post_timestamp.replace(
+                        tzinfo=None
+                    )
+                }
             posts = scraper.scrape_posts(
                 forum_profile.forum_user_id,
                 fallback=fallback,
-                start=posts_scrape_start.replace(tzinfo=None)
+                start=posts_scrape_start.replace(tzinfo=None),
+                **watermark
             )
-            # Save each new post
-            message_ids = []
-            for post in posts:
-                message_ids.append(post['message_id'])
-                post_check = ForumPost.objects.filter(
-                    forum_profile=forum_profile,
-                    topic_id=post['topic_id'],
-                    message_id=post['message_id'],
-                )
-                if not post_check.exists():
-                    # Bitcointalk uses UTC timestamps, so well pass
-                    # that timezone info to the timestamp object
-                    post_timestamp = post['timestamp'].replace(
-                        tzinfo=UTC
-                    )
-                    forum_post = ForumPost(
-                        user_profile=forum_profile.user_profile,
-                        forum_profile=forum_profile,
-                        forum_rank=forum_profile.forum_rank,
-                        topic_id=post['topic_id'],
-                        message_id=post['message_id'],
-                        unique_content_length=post['content_length'],
-                        timestamp=post_timestamp
-                    )
-                    forum_post.save()
+            # Track the signature uptime of the posts still maturing
+            tracked_posts = forum_profile.track_signature_minutes()
+            # Save the new posts in one go, the ones already stored are
+            # skipped by the database
+            message_ids = [x['message_id'] for x in posts]
+            new_posts = ForumPost.ingest(forum_profile, posts)
+            forum_profile.update_watermark(posts)
             # Check for post deletion
-            deleted_posts = ForumPost.objects.filter(
-                forum_profile=forum_profile,
-                matured=False,
-                timestamp__gte=posts_scrape_start
-            ).exclude(
-                message_id__in=message_ids
-            )
-            for post in deleted_posts:
-                post.credited = False
-                post.monitoring = False
-                post.save()
-            # Update tracked posts by saving it, whic will trigger
-            # post save logic where the updates are done
-            for post in tracked_posts:
-                forum_post = ForumPost.objects.get(
-                    message_id=post,
-                    forum_profile=forum_profile
+            if deletion_check:
+                forum_profile.mark_deleted_posts(
+                    posts_scrape_start,
+                    message_ids
                 )
-                forum_post.save()
+                forum_profile.last_deletion_check = timezone.now()
+            # Scrape again soon while there is something to track,
+            # otherwise back off
+            forum_profile.schedule_next_scrape(
+                active=bool(tracked_posts or new_posts or signature_changed)
+            )
             # Update the forum_profile's last scrape timestamp
             forum_profile.last_scrape = timezone.now()
             forum_profile.save()
+            # Serve the user's new stats on the dashboard
+            forum_profile.user_profile.refresh_dashboard()
     except ScraperError as exc:
         try:
             message = '%s - Retrying forum profile scraping' % (retries)
@@ -243,8 +241,10 @@ def verify_profile_signature(forum_site_id, forum_profile_id, signature_id):
         forum_profile.forum_user_id,
         expected_links,
         test_mode=config.TEST_MODE,
-        test_signature=signature.test_signature)
-    _, page_ok, verified, _, username, _, fallback = results
+        test_signature=signature.test_signature,
+        # The user just edited the signature, a cached page may predate it
+        use_cache=False)
+    _, page_ok, verified, _, username, _, fallback, _ = results
     if verified:
         # Save the forum username
         forum_profile.forum_username = username
@@ -252,8 +252,90 @@ def verify_profile_signature(forum_site_id, forum_profile_id, signature_id):
     return verified
 
 
+@shared_task(queue='scrapers')
+def verify_saved_signature(forum_profile_id, signature_id):
+    """ Verifies the signature saved on the forum profile, then pushes the
+    outcome to the users who saved it. The profile is only marked verified
+    if the signature is still the saved one. """
+    key = '%s:%s' % (forum_profile_id, signature_id)
+    result = {
+        'forum_profile_id': str(forum_profile_id),
+        'signature_id': str(signature_id),
+        'success': False
+    }
+    try:
+        forum_profile = ForumProfile.objects.get(id=forum_profile_id)
+        verified = verify_profile_signature(
+            forum_profile.forum_id,
+            forum_profile.id,
+            signature_id
+        )
+        if verified:
+            with transaction.atomic():
+                # Saved for the referral bonus, the scrape saved the username
+                forum_profile = ForumProfile.objects.select_for_update().get(
+                    id=forum_profile_id
+                )
+                if str(forum_profile.signature_id) == str(signature_id):
+                    forum_profile.verified = True
+                    forum_profile.date_verified = timezone.now()
+                    forum_profile.save()
+                else:
+                    verified = False
+            if verified:
+                # Update the data for this newly verified forum profile
+                job = update_data.delay(forum_profile.id)
+                result['success'] = True
+                result['task_id'] = job.id
+            else:
+                # The job of the newer signature tells the outcome
+                result['message'] = 'signature_changed'
+        else:
+            result['message'] = 'signature_not_found'
+    except Exception:
+        # Tell the waiting users, who can try again right away
+        result['message'] = 'verification_failed'
+        usernames = background.release(SIGNATURE_VERIFICATION, key)
+        for username in usernames:
+            background.push(username, SIGNATURE_VERIFICATION, result)
+        raise
+    usernames = background.complete(
+        SIGNATURE_VERIFICATION,
+        key,
+        result,
+        settings.SIGNATURE_VERIFICATION_TIMEOUT
+    )
+    for username in usernames:
+        background.push(username, SIGNATURE_VERIFICATION, result)
+    return result
+
+
+def get_forum_profile_status(forum, forum_user_id, user_id):
+    """ Details of the forum profile as stored, as seen by the user """
+    result = {'active': False, 'with_signature': False}
+    fp_check = ForumProfile.objects.filter(
+        forum=forum,
+        forum_user_id=forum_user_id
+    )
+    result['exists'] = fp_check.exists()
+    if fp_check.exists():
+        fp = fp_check.latest()
+        result['forum_profile_id'] = fp.id
+        result['own'] = False
+        if fp.user_profile.user.id == user_id:
+            result['own'] = True
+            if fp.posts.count():
+                result['active'] = True
+        result['verified'] = fp.verified
+        if fp.signature and fp.verified:
+            result['with_signature'] = True
+    return result
+
+
 @shared_task(bind=True, queue='control', max_retries=3)
-def get_user_position(self, forum_site_id, forum_user_id, user_id):
+def get_user_position(self, forum_site_id, forum_user_id, user_id=None):
+    """ Scrapes the forum position of the user. The stored forum profile
+    details are left out when no user ID is given. """
     retries = self.request.retries
     # Don't remove this print statement, it's used by pytest
     print('Retry', retries)
@@ -275,24 +357,12 @@ def get_user_position(self, forum_site_id, forum_user_id, user_id):
             'forum_user_id': forum_user_id,
             'forum_user_name': username
         }
-        fp_check = ForumProfile.objects.filter(
-            forum=forum,
-            forum_user_id=forum_user_id
-        )
-        result['active'] = False
-        result['with_signature'] = False
-        result['exists'] = fp_check.exists()
-        if fp_check.exists():
-            fp = fp_check.latest()
-            result['forum_profile_id'] = fp.id
-            result['own'] = False
-            if fp.user_profile.user.id == user_id:
-                result['own'] = True
-                if fp.posts.count():
-                    result['active'] = True
-            result['verified'] = fp.verified
-            if fp.signature and fp.verified:
-                result['with_signature'] = True
+        if user_id is not None:
+            result.update(get_forum_profile_status(
+                forum,
+                forum_user_id,
+                user_id
+            ))
     except ProfileDoesNotExist as exc:
         result = {
             'found': False,
@@ -322,6 +392,107 @@ def get_user_position(self, forum_site_id, forum_user_id, user_id):
     return result
 
 
+def get_profile_check(forum, info, user):
+    """
+    Turns the result of a forum position lookup into the response of the
+    check_profile endpoint for the user
+    """
+    response = {'found': info['found']}
+    if info['found']:
+        if info['status_code'] == 200 and info['position']:
+            response['position'] = info['position']
+            allowed = False
+            try:
+                forum_rank = ForumUserRank.objects.get(
+                    forum_site=forum,
+                    name__iexact=info['position'].strip()
+                )
+                if forum_rank.allowed or config.TEST_MODE:
+                    allowed = True
+            except ForumUserRank.DoesNotExist as exc:
+                rollbar.report_message(
+                    f'{exc}, username: {user}, user_id: {user.id}, info: {info}',
+                    'warning'
+                )
+            response['position_allowed'] = allowed
+            response['forum_user_id'] = info['forum_user_id']
+            response['found'] = True
+            profile_status = get_forum_profile_status(
+                forum,
+                info['forum_user_id'],
+                user.id
+            )
+            response['exists'] = profile_status['exists']
+            if profile_status['exists']:
+                response['verified'] = profile_status['verified']
+                response['own'] = profile_status['own']
+                response['active'] = profile_status['active']
+                response['with_signature'] = profile_status['with_signature']
+                response['forum_profile_id'] = profile_status['forum_profile_id']
+        response['status_code'] = info['status_code']
+    else:
+        response.update(info)
+    return response
+
+
+def start_profile_lookup(forum, forum_user_id, user):
+    """
+    Looks up the forum user's position in the background, sharing the
+    lookup with the other users checking the same forum user meanwhile
+    :return: the lookup handle
+    """
+    scraper = load_scraper(forum.scraper_name)
+    forum_user_id = scraper.extract_user_id(forum_user_id)
+    handle = '%s:%s' % (forum.id, forum_user_id)
+    if background.get_result(PROFILE_LOOKUP, handle) is not None:
+        # Looked up a moment ago, the kept result answers the request
+        return handle
+    started = background.claim(
+        PROFILE_LOOKUP,
+        handle,
+        user.username,
+        settings.PROFILE_LOOKUP_TIMEOUT
+    )
+    if started:
+        get_user_position.apply_async(
+            (str(forum.id), forum_user_id),
+            link=publish_profile_lookup.s(handle),
+            link_error=release_profile_lookup.si(handle)
+        )
+    return handle
+
+
+@shared_task(queue='control')
+def publish_profile_lookup(info, handle):
+    """ Keeps the lookup result for polling and pushes it to the users
+    waiting for it """
+    usernames = background.complete(
+        PROFILE_LOOKUP,
+        handle,
+        info,
+        settings.PROFILE_LOOKUP_EXPIRY
+    )
+    forum = ForumSite.objects.get(id=handle.split(':')[0])
+    for user in User.objects.filter(username__in=usernames):
+        background.push(user.username, PROFILE_LOOKUP, {
+            'handle': handle,
+            'profile': get_profile_check(forum, info, user)
+        })
+
+
+@shared_task(queue='control')
+def release_profile_lookup(handle):
+    """ Lets the failed lookup be started again and tells the users
+    waiting for it """
+    usernames = background.release(PROFILE_LOOKUP, handle)
+    for username in usernames:
+        background.push(username, PROFILE_LOOKUP, {
+            'handle': handle,
+            'success': False,
+            'message': 'lookup_failed'
+        })
+
+
 def send_websocket_signal(signal):
     # Send a test message over websocket
     redis_publisher = RedisPublisher(facility='signals', broadcast=True)
@@ -331,55 +502,75 @@ def send_websocket_signal(signal):
 
 @shared_task(queue='compute')
 def compute_ranking():
-    users = UserProfile.objects.filter(
-        user__is_active=True
-    )
+    # Points, ranks and global total all come from the same query
+    rows = Ranking.compute_user_points()
     user_points = []
-    for user in users:
-        if user.with_forum_profile:
-            total_points = user.total_points
-            info = {
-                'user_profile_id': str(user.id),
-                'total_points': total_points
-            }
-            user_points.append(info)
-    if user_points:
-        # Sort the points based on the total
-        user_points = sorted(
-            user_points,
-            key=itemgetter('total_points'),
-            reverse=True
-        )
-    # Ranking batch
     global_total = 0
-    try:
-        last_ranking = Ranking.objects.all().latest()
-        batch_number = last_ranking.batch + 1
-    except Ranking.DoesNotExist:
-        batch_number = 1
-    for rank, user in enumerate(user_points, 1):
-        # Update user's ranking
-        user_points[rank - 1]['rank'] = rank
-        ranking = Ranking(
-            batch=batch_number,
-            user_profile_id=user['user_profile_id'],
-            rank=rank
-        )
-        ranking.save()
-    # Compute the global total points
-    global_total = sum([x['total_points'] for x in user_points])
-    # Send ws signals to all connected clients if global total has changed
+    for row in rows:
+        user_points.append({
+            'user_profile_id': str(row['user_profile_id']),
+            'total_points': float(row['total_points']),
+            'rank': row['rank']
+        })
+        global_total = round(float(row['global_total']), 2)
+    # Ranking batch
+    last_batch = Ranking.objects.aggregate(Max('batch'))['batch__max']
+    batch_number = (last_batch or 0) + 1
+    # Ranks of today's previous batch, the dashboards of the users whose
+    # rank moved are rebuilt
+    previous_ranks = dict(Ranking.objects.filter(
+        date=timezone.now().date()
+    ).values_list('user_profile_id', 'rank'))
+    moved = [
+        user['user_profile_id'] for user in user_points
+        if previous_ranks.get(uuid.UUID(user['user_profile_id'])) != user['rank']
+    ]
+    # Save the users' rankings in one go, replacing today's ranks
+    Ranking.record(batch_number, user_points)
+    # Keep today's rank in the users' daily stats
+    UserDailyStats.record({
+        user['user_profile_id']: {'rank': user['rank']}
+        for user in user_points
+    })
+    # Reconcile the incrementally updated leaderboard with the database
+    leaderboard.rebuild(user_points)
+    # Rebuild the snapshot served by the leaderboard endpoint
+    UserProfile.refresh_leader_board()
     old_total = settings.REDIS_DB.get('global_total_points')
+    # Save the global total points and the current ranking batch in
+    # redis, the endpoints' ETags are derived from them
+    pipe = settings.REDIS_DB.pipeline()
+    pipe.set('global_total_points', global_total)
+    pipe.set('ranking_batch', batch_number)
+    pipe.set('ranking_timestamp', int(time.time()))
+    pipe.execute()
+    # Send ws signals to all connected clients if global total has changed,
+    # once the new data is ready to be served
     if old_total:
         if float(old_total) != global_total:
             send_websocket_signal('refresh')
-    # Save the global total points in redis
-    settings.REDIS_DB.set('global_total_points', global_total)
-    # Remove useless data from the table
-    Ranking.clean_ranking()
+    for i in range(0, len(moved), DASHBOARD_REFRESH_CHUNK):
+        refresh_dashboards.delay(moved[i:i + DASHBOARD_REFRESH_CHUNK])
     return {'total': global_total, 'points': user_points}
 
 
+@shared_task(queue='compute')
+def refresh_dashboards(user_profile_ids):
+    UserProfile.refresh_dashboards(user_profile_ids)
+
+
+@shared_task(queue='compute')
+def recompute_ranking():
+    """ Runs compute_ranking requested with leaderboard.request_recompute
+    once the requests quieten down """
+    delay = leaderboard.recompute_delay()
+    if delay:
+        recompute_ranking.apply_async(countdown=delay)
+        return False
+    compute_ranking()
+    return True
+
+
 @shared_task(queue='compute')
 def compute_points():
     posts = ForumPost.objects.filter(
@@ -387,16 +578,15 @@ def compute_points():
         forum_profile__active=True,
         monitoring=True
     )
-    for post in posts:
-        pct_threshold = config.UPTIME_PERCENTAGE_THRESHOLD
-        downtime_threshold_pct = (100 - pct_threshold)
-        maturation = config.MATURATION_PERIOD
-        downtime_pct = (post.invalid_sig_minutes / (maturation * 60))
-        downtime_pct *= 100
-        if downtime_pct >= downtime_threshold_pct:
-            post.credited = False
-            post.monitoring = False
-            post.save()
+    # Stop crediting the posts whose signature was missing for longer
+    # than the uptime threshold allows, in one statement
+    downtime_threshold_pct = 100 - config.UPTIME_PERCENTAGE_THRESHOLD
+    maturation_minutes = config.MATURATION_PERIOD * 60
+    max_downtime = maturation_minutes * downtime_threshold_pct / 100
+    # The minutes are whole numbers, round the limit up accordingly
+    ForumPost.uncredit(posts.filter(
+        invalid_sig_minutes__gte=math.ceil(max_downtime)
+    ))
     compute_ranking.delay()
 
 
@@ -411,15 +601,33 @@ def update_data(forum_profile_id=None):
     if forum_profile_id:
         forum_profiles = ForumProfile.objects.filter(id__in=[forum_profile_id])
     else:
+        # Only the profiles that are due according to their own schedule
         forum_profiles = ForumProfile.objects.filter(
+            Q(next_scrape__isnull=True) | Q(next_scrape__lte=timezone.now()),
             user_profile__user__is_active=True,
             active=True,
             verified=True
+        ).order_by('next_scrape')
+    profile_ids = list(forum_profiles.values_list('id', flat=True))
+    if not forum_profile_id:
+        # Push the due profiles out of the next runs until their scrape
+        # sets the actual schedule
+        lease = timezone.now() + timedelta(
+            seconds=settings.USER_SCRAPE_INTERVAL_MAX
+        )
+        ForumProfile.objects.filter(id__in=profile_ids).update(
+            next_scrape=lease
         )
-    # Collect the forum profile scraping subtasks
+    # Collect the forum profile scraping subtasks, spread evenly over
+    # the interval rather than started all at once
     subtasks = []
-    for profile in forum_profiles:
-        subtasks.append(scrape_forum_profile.s(profile.id))
+    for index, profile_id in enumerate(profile_ids):
+        countdown = 0
+        if not forum_profile_id:
+            countdown = index * settings.USER_SCRAPE_INTERVAL // len(profile_ids)
+        subtasks.append(
+            scrape_forum_profile.s(profile_id).set(countdown=countdown)
+        )
     # Execute the subtasks in parallel then trigger the
     # compute_points task afterwards
     chord(subtasks)(compute_points.si())
@@ -434,25 +642,33 @@ def update_data(forum_profile_id=None):
 
 @shared_task(queue='control')
 def set_scraping_rate(num_users=None):
-    from subprocess import Popen, PIPE
+    """
+    Checks that the shared scraper rate limit can keep up with the number
+    of forum profiles. The fetches themselves are paced by the Redis rate
+    limiter, which adapts to the forum on its own.
+    """
     if not num_users:
         forum_profiles = ForumProfile.objects.filter(active=True)
         num_users = forum_profiles.count()
-    rate = '1/s'
-    rate_per_sec = num_users / settings.USER_SCRAPE_INTERVAL
-    rate_per_sec = int(round(rate_per_sec, 2))
-    if rate_per_sec > 1:
-        rate = '%s/s' % rate_per_sec
-    else:
-        rate_per_min = num_users / (settings.USER_SCRAPE_INTERVAL / 60)
-        rate_per_min = int(round(rate_per_min, 2))
-        if rate_per_min > 1:
-            rate = '%s/m' % rate_per_min
-    cmd = 'celery -A volentix control rate_limit'
-    cmd += ' venue.tasks.scrape_forum_profile %s' % rate
-    proc = Popen(cmd, shell=True, stdout=PIPE, stderr=PIPE)
-    stdout, stderr = proc.communicate()
-    return (rate, stdout.decode())
+    # Each scrape fetches at least the profile page and one posts page
+    required_rate = num_users * 2 / settings.USER_SCRAPE_INTERVAL
+    host = urlparse(settings.BITCOINTALK_URL).netloc
+    current_rate = RateLimiter(host).get_rate()
+    if required_rate > current_rate:
+        log_opts = {
+            'level': 'warning',
+            'meta': {
+                'num_users': num_users,
+                'required_rate': required_rate,
+                'current_rate': current_rate
+            }
+        }
+        logger.info(
+            'Scraper rate limit is too low for the scrape interval',
+            log_opts
+        )
+    rate = '%s/s' % round(required_rate, 2)
+    return (rate, current_rate)
 
 
 # -----------------------------------
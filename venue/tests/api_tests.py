@@ -1,4 +1,4 @@
-from venue.views import assign_verto_address
+from venue.views import assign_verto_address, get_leaderboard_data
 from venue.models import UserProfile
 import pytest
 
@@ -27,3 +27,52 @@ def test_assign_verto_address(rf):
     response = assign_verto_address(request)
     assert response.status_code == 400
     assert response.data['error_code'] == 'verto_address_not_unique'
+
+
+@pytest.mark.django_db
+def test_leaderboard_pagination(rf):
+    UserProfile.objects.update(email_confirmed=True)
+    UserProfile.refresh_leader_board()
+    request = rf.get('/api/retrieve/leaderboard-data/', {'limit': 1})
+    response = get_leaderboard_data(request)
+    assert response.status_code == 200
+    assert len(response.data['rankings']) <= 1
+    total_users = response.data['sitewide']['total_users']
+    # Follow the cursors through all the rankings
+    usernames = [x['username'] for x in response.data['rankings']]
+    cursor = response.data['next_cursor']
+    while cursor:
+        request = rf.get(
+            '/api/retrieve/leaderboard-data/',
+            {'limit': 1, 'cursor': cursor}
+        )
+        response = get_leaderboard_data(request)
+        assert response.status_code == 200
+        usernames += [x['username'] for x in response.data['rankings']]
+        cursor = response.data['next_cursor']
+    assert len(usernames) == total_users
+    assert len(set(usernames)) == total_users
+
+    request = rf.get('/api/retrieve/leaderboard-data/', {'cursor': 'xxx'})
+    response = get_leaderboard_data(request)
+    assert response.status_code == 400
+    assert response.data['message'] == 'invalid_cursor'
+
+
+@pytest.mark.django_db
+def test_leaderboard_not_modified(rf):
+    request = rf.get('/api/retrieve/leaderboard-data/')
+    response = get_leaderboard_data(request)
+    assert response.status_code == 200
+    etag = response['ETag']
+    request = rf.get('/api/retrieve/leaderboard-data/', HTTP_IF_NONE_MATCH=etag)
+    response = get_leaderboard_data(request)
+    assert response.status_code == 304
+    # Another page is another version of the data
+    request = rf.get(
+        '/api/retrieve/leaderboard-data/',
+        {'limit': 1},
+        HTTP_IF_NONE_MATCH=etag
+    )
+    response = get_leaderboard_data(request)
+    assert response.status_code == 200
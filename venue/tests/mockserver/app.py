@@ -1,13 +1,31 @@
+import argparse
+import json
+
 from flask import Flask
 from flask import Response
-import json
+from flask import request
+
+from simulator import Simulator, SimulatorConfig, parse_query
 
 
 app = Flask(__name__)
+simulator = None
+base_url = None
 
 
 @app.route('/bitcointalk/<params>')
 def bitcointalk(params):
+    if simulator:
+        status, html = simulator.handle(
+            parse_query(request.query_string.decode('latin-1')),
+            base_url
+        )
+        return Response(
+            html.encode('latin-1', errors='xmlcharrefreplace'),
+            status=status,
+            mimetype='text/html',
+            headers={'Content-Type': 'text/html; charset=ISO-8859-1'}
+        )
     response = {}
     return Response(
         json.dumps(response),
@@ -16,4 +34,83 @@ def bitcointalk(params):
     )
 
 
-app.run(host='0.0.0.0', port=5000)
+@app.route('/stats', methods=['GET', 'DELETE'])
+def stats():
+    if not simulator:
+        return Response(status=404)
+    if request.method == 'DELETE':
+        simulator.stats.reset()
+    return Response(
+        json.dumps(simulator.stats.summary(), indent=2),
+        mimetype='application/json'
+    )
+
+
+@app.route('/stats/users/<int:user_id>')
+def user_stats(user_id):
+    if not simulator:
+        return Response(status=404)
+    return Response(
+        json.dumps(simulator.stats.user(user_id)),
+        mimetype='application/json'
+    )
+
+
+def parse_args():
+    arg_parser = argparse.ArgumentParser(
+        description='Mock bitcointalk server'
+    )
+    arg_parser.add_argument('--port', type=int, default=5000)
+    arg_parser.add_argument('--base-url',
+                            help='forum URL used in the page links, as '
+                                 'configured in BITCOINTALK_URL')
+    arg_parser.add_argument('--simulate', action='store_true',
+                            help='serve synthetic forum pages instead of '
+                                 'HTTP 500 responses')
+    arg_parser.add_argument('--users', type=int, default=1000)
+    arg_parser.add_argument('--seed', type=int, default=1)
+    arg_parser.add_argument('--missing-ratio', type=float, default=0.01)
+    arg_parser.add_argument('--signature-ratio', type=float, default=0.5)
+    arg_parser.add_argument('--signature-link', action='append',
+                            dest='signature_links')
+    arg_parser.add_argument('--posts-per-day', type=float, default=2.0)
+    arg_parser.add_argument('--latency-ms', type=float, default=0.0,
+                            help='median response latency')
+    arg_parser.add_argument('--latency-sigma', type=float, default=0.0,
+                            help='sigma of the log-normal latency')
+    arg_parser.add_argument('--latency-max-ms', type=float, default=10000.0)
+    arg_parser.add_argument('--error-403', type=float, default=0.0)
+    arg_parser.add_argument('--error-503', type=float, default=0.0)
+    arg_parser.add_argument('--timeout-ratio', type=float, default=0.0)
+    arg_parser.add_argument('--timeout-seconds', type=float, default=35.0)
+    arg_parser.add_argument('--rate-limit', type=float, default=0.0,
+                            help='requests per second, 0 disables it')
+    arg_parser.add_argument('--rate-limit-burst', type=float)
+    arg_parser.add_argument('--rate-limit-status', type=int, default=403,
+                            choices=[403, 429, 503])
+    return arg_parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    base_url = args.base_url or 'http://localhost:%d/bitcointalk' % args.port
+    if args.simulate:
+        simulator = Simulator(SimulatorConfig(
+            users=args.users,
+            seed=args.seed,
+            missing_ratio=args.missing_ratio,
+            signature_ratio=args.signature_ratio,
+            signature_links=args.signature_links,
+            posts_per_day=args.posts_per_day,
+            latency_ms=args.latency_ms,
+            latency_sigma=args.latency_sigma,
+            latency_max_ms=args.latency_max_ms,
+            error_403=args.error_403,
+            error_503=args.error_503,
+            timeout_ratio=args.timeout_ratio,
+            timeout_seconds=args.timeout_seconds,
+            rate_limit=args.rate_limit,
+            rate_limit_burst=args.rate_limit_burst,
+            rate_limit_status=args.rate_limit_status
+        ))
+    app.run(host='0.0.0.0', port=args.port, threaded=True)
@@ -0,0 +1,478 @@
+"""
+Synthetic bitcointalk forum used for end-to-end scrape load testing
+
+Every user ID between 1 and the configured number of users maps to a
+deterministic synthetic forum user with a rank, a post history that keeps
+growing while the simulator runs and, for a share of the users, the
+campaign signature. Nothing is stored per user, so the simulator serves
+100k profiles as cheaply as 10.
+"""
+
+import math
+import random
+import threading
+import time
+from collections import Counter, deque
+from datetime import datetime
+
+POSTS_PER_PAGE = 20
+
+# Position name, relative weight and range of the post count
+POSITIONS = [
+    ('Brand New', 5, (0, 0)),
+    ('Newbie', 30, (1, 30)),
+    ('Jr. Member', 20, (30, 60)),
+    ('Member', 20, (60, 120)),
+    ('Full Member', 12, (120, 240)),
+    ('Sr. Member', 7, (240, 500)),
+    ('Hero Member', 4, (500, 1000)),
+    ('Legendary', 2, (1000, 5000))
+]
+
+WORDS = (
+    'bitcoin block chain miner wallet node fee transaction segwit lightning '
+    'exchange price market halving difficulty hashrate pool payout address '
+    'signature campaign escrow trust merit thread topic board altcoin token '
+    'bounty project team roadmap whitepaper community support update release'
+).split()
+
+ERROR_MESSAGES = {
+    403: 'Forbidden',
+    404: 'Not Found',
+    429: 'Too Many Requests',
+    503: 'Service Unavailable',
+    504: 'Gateway Timeout'
+}
+
+DATE_FORMAT = '%B %d, %Y, %I:%M:%S %p'
+TIME_FORMAT = '%I:%M:%S %p'
+
+
+class SimulatorConfig(object):
+    """ Tunable behaviour of the simulated forum """
+
+    def __init__(self, users=1000, seed=1, missing_ratio=0.01,
+                 signature_ratio=0.5, signature_links=None,
+                 posts_per_day=2.0, latency_ms=0.0, latency_sigma=0.0,
+                 latency_max_ms=10000.0, error_403=0.0, error_503=0.0,
+                 timeout_ratio=0.0, timeout_seconds=35.0, rate_limit=0.0,
+                 rate_limit_burst=None, rate_limit_status=403):
+        self.users = users
+        self.seed = seed
+        self.missing_ratio = missing_ratio
+        self.signature_ratio = signature_ratio
+        self.signature_links = signature_links or [
+            'https://volentix.io',
+            'https://t.me/volentix',
+            'https://twitter.com/volentix'
+        ]
+        self.posts_per_day = posts_per_day
+        # Latency is log-normal around the median, sigma 0 makes it fixed
+        self.latency_ms = latency_ms
+        self.latency_sigma = latency_sigma
+        self.latency_max_ms = latency_max_ms
+        self.error_403 = error_403
+        self.error_503 = error_503
+        self.timeout_ratio = timeout_ratio
+        self.timeout_seconds = timeout_seconds
+        # Requests per second allowed across all clients, 0 disables it
+        self.rate_limit = rate_limit
+        self.rate_limit_burst = rate_limit_burst or max(rate_limit, 1)
+        self.rate_limit_status = rate_limit_status
+
+
+class SyntheticUser(object):
+    """ A forum user generated from the seed and the user ID """
+
+    def __init__(self, config, user_id, started):
+        rng = random.Random('%s:%s' % (config.seed, user_id))
+        self.user_id = user_id
+        self.exists = 0 < user_id <= config.users and \
+            rng.random() >= config.missing_ratio
+        self.username = 'sim_user_%d' % user_id
+        weights = [x[1] for x in POSITIONS]
+        position, _, (low, high) = POSITIONS[
+            weighted_choice(rng, weights)
+        ]
+        self.position = position
+        self.initial_posts = rng.randint(low, high)
+        self.has_signature = rng.random() < config.signature_ratio
+        # Each user posts at a steady pace around the configured average
+        posts_per_day = config.posts_per_day * rng.uniform(0.2, 1.8)
+        if posts_per_day > 0:
+            self.post_interval = 86400.0 / posts_per_day
+        else:
+            self.post_interval = None
+        self.started = started
+        self.seed = config.seed
+
+    def total_posts(self, now):
+        if self.post_interval is None:
+            return self.initial_posts
+        elapsed = max(now - self.started, 0)
+        return self.initial_posts + int(elapsed // self.post_interval)
+
+    def post(self, index):
+        """
+        Returns the details of the post with the given index, counted from
+        the oldest post of the user
+        """
+        rng = random.Random('%s:%s:%s' % (self.seed, self.user_id, index))
+        interval = self.post_interval or 86400.0
+        offset = (index - self.initial_posts + 1) * interval
+        timestamp = self.started + offset - rng.uniform(0, interval / 2)
+        return {
+            'topic_id': rng.randint(1000000, 5000000),
+            'message_id': self.user_id * 1000000 + index,
+            'timestamp': datetime.utcfromtimestamp(timestamp),
+            'quote': rng.random() < 0.2,
+            'body': paragraph(rng)
+        }
+
+
+class RateLimiter(object):
+    """ Token bucket shared by all the requests to the simulator """
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.time()
+        self.lock = threading.Lock()
+
+    def allow(self):
+        with self.lock:
+            now = time.time()
+            self.tokens = min(
+                self.burst,
+                self.tokens + (now - self.updated) * self.rate
+            )
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return True
+            return False
+
+
+class Stats(object):
+    """ Counters of the served requests """
+
+    def __init__(self, window=10):
+        self.window = window
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.started = time.time()
+            self.total = 0
+            self.statuses = Counter()
+            self.kinds = Counter()
+            self.user_fetches = Counter()
+            self.recent = deque()
+
+    def record(self, kind, user_id, status):
+        with self.lock:
+            now = time.time()
+            self.total += 1
+            self.statuses[status] += 1
+            self.kinds[kind] += 1
+            if user_id is not None:
+                self.user_fetches[(user_id, kind)] += 1
+            self.recent.append(now)
+            while self.recent and self.recent[0] < now - self.window:
+                self.recent.popleft()
+
+    def user(self, user_id):
+        with self.lock:
+            return {
+                kind: count
+                for (uid, kind), count in self.user_fetches.items()
+                if uid == user_id
+            }
+
+    def summary(self, top=20):
+        with self.lock:
+            now = time.time()
+            elapsed = max(now - self.started, 1e-6)
+            while self.recent and self.recent[0] < now - self.window:
+                self.recent.popleft()
+            per_user = Counter()
+            for (user_id, kind), count in self.user_fetches.items():
+                per_user[user_id] += count
+            profile_users = sum(
+                1 for (_, kind) in self.user_fetches if kind == 'profile'
+            )
+            # Any profile fetch beyond the first one of a user is repeated
+            # work, e.g. fallback retries or a too short scrape interval
+            repeated = self.kinds['profile'] - profile_users
+            return {
+                'elapsed_seconds': round(elapsed, 3),
+                'requests': self.total,
+                'requests_per_second': round(self.total / elapsed, 2),
+                'recent_requests_per_second': round(
+                    len(self.recent) / float(self.window), 2
+                ),
+                'statuses': {str(k): v for k, v in self.statuses.items()},
+                'kinds': dict(self.kinds),
+                'users_fetched': len(per_user),
+                'repeated_profile_fetches': repeated,
+                'fetch_count_histogram': {
+                    str(k): v
+                    for k, v in sorted(Counter(per_user.values()).items())
+                },
+                'top_users': [
+                    {'user_id': k, 'fetches': v}
+                    for k, v in per_user.most_common(top)
+                ]
+            }
+
+
+class Simulator(object):
+
+    def __init__(self, config):
+        self.config = config
+        self.started = time.time()
+        self.stats = Stats()
+        self.rng = random.Random()
+        if config.rate_limit:
+            self.limiter = RateLimiter(
+                config.rate_limit,
+                config.rate_limit_burst
+            )
+        else:
+            self.limiter = None
+
+    def get_user(self, user_id):
+        return SyntheticUser(self.config, user_id, self.started)
+
+    def delay(self):
+        """ Sleeps according to the configured latency distribution """
+        config = self.config
+        if not config.latency_ms:
+            return
+        latency = config.latency_ms
+        if config.latency_sigma:
+            latency *= math.exp(self.rng.gauss(0, config.latency_sigma))
+        time.sleep(min(latency, config.latency_max_ms) / 1000.0)
+
+    def failure(self):
+        """
+        Decides whether the request fails before a page is served
+        :return: HTTP status code of the failure or None
+        """
+        config = self.config
+        if self.limiter and not self.limiter.allow():
+            return config.rate_limit_status
+        roll = self.rng.random()
+        if roll < config.timeout_ratio:
+            # Hold the connection until the client gives up
+            time.sleep(config.timeout_seconds)
+            return 504
+        roll -= config.timeout_ratio
+        if roll < config.error_403:
+            return 403
+        roll -= config.error_403
+        if roll < config.error_503:
+            return 503
+        return None
+
+    def handle(self, params, base_url):
+        """
+        Serves a request for index.php with SMF style query parameters
+        :param params: dict of the query parameters
+        :param base_url: URL of the simulated forum, used in the page links
+        :return: tuple of HTTP status code and HTML
+        """
+        kind = 'posts' if params.get('sa') == 'showPosts' else 'profile'
+        try:
+            user_id = int(params.get('u'))
+        except (TypeError, ValueError):
+            user_id = None
+        self.delay()
+        status = self.failure()
+        if status:
+            html = error_page(ERROR_MESSAGES[status])
+        elif user_id is None or params.get('action') != 'profile':
+            status, html = 404, error_page(ERROR_MESSAGES[404])
+        else:
+            status = 200
+            user = self.get_user(user_id)
+            if not user.exists:
+                html = profile_not_found(base_url)
+            elif kind == 'posts':
+                try:
+                    start = int(params.get('start', 0))
+                except ValueError:
+                    start = 0
+                html = posts_page(user, start, base_url, self.config)
+            else:
+                html = profile_page(user, base_url, self.config)
+        self.stats.record(kind, user_id, status)
+        return (status, html)
+
+
+def parse_query(query_string):
+    """ Parses SMF query strings, which separate parameters with ; """
+    params = {}
+    for part in query_string.replace('&', ';').split(';'):
+        if '=' in part:
+            key, value = part.split('=', 1)
+            params[key] = value
+    return params
+
+
+def weighted_choice(rng, weights):
+    roll = rng.uniform(0, sum(weights))
+    for index, weight in enumerate(weights):
+        roll -= weight
+        if roll <= 0:
+            return index
+    return len(weights) - 1
+
+
+def sentence(rng, words):
+    text = ' '.join(rng.choice(WORDS) for _ in range(words))
+    return text.capitalize() + '.'
+
+
+def paragraph(rng):
+    return ' '.join(
+        sentence(rng, rng.randint(6, 18))
+        for _ in range(rng.randint(1, 4))
+    )
+
+
+def format_date(timestamp, now):
+    if timestamp.date() == now.date():
+        return 'Today at ' + timestamp.strftime(TIME_FORMAT)
+    return timestamp.strftime(DATE_FORMAT)
+
+
+# -----
+# Pages
+# -----
+
+PAGE_HEAD = '''<!DOCTYPE html PUBLIC "-//W3C//DTD XHTML 1.0 Transitional//EN" "http://www.w3.org/TR/xhtml1/DTD/xhtml1-transitional.dtd">
+<html xmlns="http://www.w3.org/1999/xhtml"><head>
+<meta http-equiv="Content-Type" content="text/html; charset=ISO-8859-1" />
+<title>{title}</title>
+</head>
+<body>
+<div id="bodyarea" style="padding: 1ex 0px 2ex 0px;">
+<div style="margin-bottom: 1ex;"><table width="100%" cellpadding="3" cellspacing="0"><tr><td><div class="nav"><b><a href="{base_url}/index.php" class="nav">Bitcoin Forum</a></b>&nbsp;&gt;&nbsp;<b>{title}</b></div></td></tr></table></div>
+'''
+
+PAGE_FOOT = '''</div>
+<div id="footerarea" style="text-align: center;"><span class="smalltext">SMF &copy; 2006-2009, Simple Machines</span></div>
+</body></html>
+'''
+
+
+def page(title, body, base_url):
+    return PAGE_HEAD.format(title=title, base_url=base_url) + body + PAGE_FOOT
+
+
+def error_page(message):
+    return '<html><head><title>%s</title></head><body><h1>%s</h1></body></html>' % (message, message)
+
+
+def profile_not_found(base_url):
+    body = '''<table border="0" width="80%" cellspacing="0" align="center" cellpadding="4" class="tborder">
+<tr class="titlebg"><td>An Error Has Occurred!</td></tr>
+<tr class="windowbg"><td>The user whose profile you are trying to view does not exist.</td></tr>
+</table>
+'''
+    return page('An Error Has Occurred!', body, base_url)
+
+
+def profile_page(user, base_url, config):
+    now = time.time()
+    total_posts = user.total_posts(now)
+    rows = [
+        ('Name: ', user.username),
+        ('Posts: ', total_posts),
+        ('Activity:', min(total_posts, 14 * 60)),
+        ('Merit:', total_posts // 10),
+        ('Position: ', user.position),
+        ('Date Registered: ', 'March 14, 2014, 09:26:53 AM'),
+        ('Last Active: ', format_date(datetime.utcnow(), datetime.utcnow()))
+    ]
+    rows = ['<tr><td><b>%s</b></td><td>%s</td></tr>' % x for x in rows]
+    if user.has_signature:
+        signature = ' '.join(
+            '<a class="ul" href="%s">%s</a>' % (x, x.split('//')[-1])
+            for x in config.signature_links
+        )
+    else:
+        signature = ''
+    rows.append('<tr><td colspan="2"><hr size="1" width="100%" class="hrcolor" /></td></tr>')
+    rows.append('<tr><td colspan="2" height="25"><b>Signature:</b><br /><div class="signature">%s</div></td></tr>' % signature)
+    rows.append('<tr><td colspan="2"><a href="%s/index.php?action=profile;u=%d;sa=showPosts">Show the last posts of this person.</a></td></tr>' % (base_url, user.user_id))
+    body = '''<table border="0" cellpadding="4" cellspacing="1" align="center" class="bordercolor">
+<tr class="titlebg"><td width="420" height="26"><img src="https://bitcointalk.org/Themes/custom1/images/icons/profile_sm.gif" alt="" align="top" />&nbsp;Summary - %s</td><td align="center" width="150">Picture</td></tr>
+<tr><td class="windowbg" width="420"><table border="0" cellspacing="0" cellpadding="2" width="100%%">
+%s
+</table></td><td class="windowbg" valign="middle" align="center" width="150"></td></tr>
+</table>
+''' % (user.username, '\n'.join(rows))
+    return page('View the profile of %s' % user.username, body, base_url)
+
+
+def page_links(user, start, total_pages, base_url):
+    """ Page navigation the way SMF renders it: first, last and nearby """
+    current = start // POSTS_PER_PAGE
+    shown = {0, total_pages - 1}
+    shown.update(range(max(current - 2, 0), min(current + 3, total_pages)))
+    links = []
+    previous = None
+    for number in sorted(shown):
+        if previous is not None and number - previous > 1:
+            links.append('<span>...</span>')
+        if number == current:
+            links.append('<b>%d</b>' % (number + 1))
+        else:
+            links.append(
+                '<a class="navPages" href="%s/index.php?action=profile;u=%d;'
+                'sa=showPosts;start=%d">%d</a>' % (
+                    base_url, user.user_id,
+                    number * POSTS_PER_PAGE, number + 1
+                )
+            )
+        previous = number
+    return '<table border="0" width="85%%" cellspacing="1" cellpadding="4" class="bordercolor" align="center"><tr class="catbg3"><td colspan="3"><b>Pages:</b> %s</td></tr></table>' % ' '.join(links)
+
+
+def posts_page(user, start, base_url, config):
+    total_posts = user.total_posts(time.time())
+    total_pages = max(int(math.ceil(total_posts / float(POSTS_PER_PAGE))), 1)
+    now = datetime.utcnow()
+    items = []
+    # Newest posts come first
+    newest = total_posts - 1 - start
+    for number, index in enumerate(range(newest, max(newest - POSTS_PER_PAGE, -1), -1)):
+        post = user.post(index)
+        content = post['body']
+        if post['quote']:
+            content = '<div class="quoteheader">Quote from: satoshi</div><div class="quote">%s<br /></div>%s' % (sentence(random.Random(index), 12), content)
+        items.append('''<table border="0" width="85%%" cellspacing="1" cellpadding="0" class="bordercolor" align="center">
+<tr><td width="100%%">
+<table border="0" width="100%%" cellpadding="4" cellspacing="1" class="windowbg2">
+<tr class="titlebg2"><td style="padding: 0 1ex;">%d</td><td width="75%%" class="middletext">&nbsp;<a href="%s/index.php?board=1.0">Bitcoin Discussion</a> / <a href="%s/index.php?topic=%d.msg%d#msg%d">Re: %s</a></td><td class="middletext" align="right">on: %s</td></tr>
+<tr><td width="100%%" height="80" colspan="3" valign="top" class="windowbg2"><div class="post">%s</div></td></tr>
+</table>
+</td></tr>
+</table><br />''' % (
+            start + number + 1,
+            base_url,
+            base_url,
+            post['topic_id'],
+            post['message_id'],
+            post['message_id'],
+            sentence(random.Random(post['topic_id']), 4)[:-1],
+            format_date(post['timestamp'], now),
+            content
+        ))
+    nav = page_links(user, start, total_pages, base_url)
+    body = nav + '<br />\n' + '\n'.join(items) + '\n' + nav
+    return page('Show Posts - %s' % user.username, body, base_url)
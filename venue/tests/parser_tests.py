@@ -0,0 +1,120 @@
+import os
+from datetime import datetime
+
+import pytest
+from venue.scrapers.bitcointalk import BitcoinTalk
+from venue.scrapers.exceptions import ProfileDoesNotExist, ScraperError
+from venue.scrapers.parsers import PARSER_BACKENDS, LxmlParser
+
+CORPUS_DIR = os.path.join(
+    os.path.dirname(__file__),
+    'corpus',
+    'bitcointalk'
+)
+EXPECTED_LINKS = [
+    'https://volentix.io',
+    'https://t.me/volentix',
+    'https://twitter.com/volentix'
+]
+
+
+def load_page(file_name, backend):
+    with open(os.path.join(CORPUS_DIR, file_name), 'rb') as page:
+        content = page.read()
+    scraper = BitcoinTalk(parser_backend=backend)
+    scraper.set_params('fp', '1', EXPECTED_LINKS)
+    scraper.load_response(200, content.decode('latin-1'), content)
+    return scraper
+
+
+def scrape_profile(file_name, backend):
+    scraper = load_page(file_name, backend)
+    scraper.check_profile_exists()
+    scraper.load_snapshot()
+    page_ok, verified = scraper.check_signature()
+    return (
+        scraper.get_username(),
+        scraper.get_user_position(),
+        scraper.get_total_posts(),
+        page_ok,
+        verified
+    )
+
+
+def scrape_posts_page(file_name, backend):
+    scraper = load_page(file_name, backend)
+    pages = scraper.get_posts_pages()
+    posts, _ = scraper._scrape_posts_page(
+        scraper.document,
+        start=datetime(2000, 1, 1)
+    )
+    for post in posts:
+        del post['check_datetime']
+    return (pages, posts)
+
+
+def corpus_files(prefix):
+    return sorted(x for x in os.listdir(CORPUS_DIR) if x.startswith(prefix))
+
+
+class TestParserBackends:
+
+    @pytest.mark.parametrize('file_name', corpus_files('profile_'))
+    def test_profiles_match_reference(self, file_name):
+        results = []
+        for backend in PARSER_BACKENDS:
+            try:
+                results.append(scrape_profile(file_name, backend))
+            except ProfileDoesNotExist:
+                results.append('does_not_exist')
+        assert all(x == results[0] for x in results)
+
+    @pytest.mark.parametrize('file_name', corpus_files('posts_'))
+    def test_posts_pages_match_reference(self, file_name):
+        results = [scrape_posts_page(file_name, x) for x in PARSER_BACKENDS]
+        assert all(x == results[0] for x in results)
+
+    @pytest.mark.parametrize('backend', list(PARSER_BACKENDS))
+    def test_profile_details(self, backend):
+        details = scrape_profile('profile_member_signature.html', backend)
+        assert details == ('wolverine', 'Member', 131, True, True)
+        details = scrape_profile('profile_newbie_no_signature.html', backend)
+        assert details == ('cryptonewb', 'Newbie', 7, False, False)
+        with pytest.raises(ProfileDoesNotExist):
+            scrape_profile('profile_not_found.html', backend)
+
+    def test_blank_page_is_a_scraper_error(self):
+        with pytest.raises(ScraperError):
+            LxmlParser().parse('  ')
+
+    @pytest.mark.parametrize('backend', list(PARSER_BACKENDS))
+    def test_quotes_are_not_counted(self, backend):
+        _, posts = scrape_posts_page('posts_deep_quotes.html', backend)
+        assert len(posts) == 20
+        scraper = load_page('posts_deep_quotes.html', backend)
+        post = scraper.parser.posts(scraper.document)[0]
+        full_length = len(scraper.parser.text(post).strip())
+        assert 0 < posts[0]['content_length'] < full_length
+
+    @pytest.mark.parametrize('backend', list(PARSER_BACKENDS))
+    def test_posts_stop_at_watermark(self, backend):
+        _, posts = scrape_posts_page('posts_today.html', backend)
+        scraper = load_page('posts_today.html', backend)
+        new_posts, start_reached = scraper._scrape_posts_page(
+            scraper.document,
+            start=datetime(2000, 1, 1),
+            last_message_id=int(posts[2]['message_id'])
+        )
+        assert start_reached
+        assert [x['message_id'] for x in new_posts] == \
+            [x['message_id'] for x in posts[:2]]
+
+    def test_profile_fingerprint(self):
+        fingerprints = set()
+        for backend in PARSER_BACKENDS:
+            scraper = load_page('profile_member_signature.html', backend)
+            scraper.load_snapshot()
+            fingerprints.add(scraper.snapshot.fingerprint(EXPECTED_LINKS))
+        assert len(fingerprints) == 1
+        other = scraper.snapshot.fingerprint(EXPECTED_LINKS[:1])
+        assert other not in fingerprints
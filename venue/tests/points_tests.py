@@ -1,7 +1,9 @@
 from venue.models import UserProfile, ForumProfile, ForumPost, \
-    ForumSite, ForumUserRank, Campaign
+    ForumSite, ForumUserRank, Campaign, Ranking, UserDailyStats
 from unittest.mock import patch
-from venue.tasks import update_data
+from venue import leaderboard
+from venue.tasks import update_data, compute_points, compute_ranking
+from django.conf import settings
 from django.test import TestCase
 from django.utils import timezone
 from datetime import timedelta
@@ -35,6 +37,50 @@ class CampaignNonExistenceTest(TestCase):
         result = update_data.run()
         self.assertEqual(type(result), list)
 
+    def test_current_campaign_cache(self):
+        self.assertEqual(Campaign.get_current(), self.campaign)
+        # The cached campaigns are dropped when a campaign is saved
+        campaign = mommy.make(
+            Campaign,
+            campaign_start=timezone.now() - timedelta(hours=1)
+        )
+        self.assertEqual(Campaign.get_current(), campaign)
+        campaign.campaign_end = timezone.now() - timedelta(minutes=1)
+        campaign.save()
+        self.assertIsNone(Campaign.get_current())
+
+
+class ScrapeSchedulingTest(TestCase):
+    """ Tests the adaptive scheduling of forum profile scrapes """
+
+    def setUp(self):
+        self.forum_profile = mommy.make(ForumProfile, forum_user_id='172792')
+
+    def test_dormant_profile_backs_off(self):
+        self.forum_profile.schedule_next_scrape(active=True)
+        self.assertEqual(
+            self.forum_profile.scrape_interval,
+            settings.USER_SCRAPE_INTERVAL
+        )
+        self.forum_profile.schedule_next_scrape(active=False)
+        self.assertEqual(
+            self.forum_profile.scrape_interval,
+            settings.USER_SCRAPE_INTERVAL * 2
+        )
+        for _ in range(10):
+            self.forum_profile.schedule_next_scrape(active=False)
+        self.assertEqual(
+            self.forum_profile.scrape_interval,
+            settings.USER_SCRAPE_INTERVAL_MAX
+        )
+        self.assertGreater(self.forum_profile.next_scrape, timezone.now())
+        # Activity brings the profile back to the shortest interval
+        self.forum_profile.schedule_next_scrape(active=True)
+        self.assertEqual(
+            self.forum_profile.scrape_interval,
+            settings.USER_SCRAPE_INTERVAL
+        )
+
 
 class PointsCreditingTest(TestCase):
     """ Tests the crediting of points that happens after a new forum
@@ -103,6 +149,209 @@ class PointsCreditingTest(TestCase):
         expected_total = config.POST_POINTS_MULTIPLIER + expected_bonus
         self.assertEqual(forum_post.total_points, expected_total)
 
+    @patch('venue.models.Campaign')
+    def test_bulk_ingestion(self, campaign_mock):
+        campaign_mock.get_current.return_value = self.campaign
+        posts = [self.post, dict(self.post, message_id='98372738')]
+        self.assertEqual(ForumPost.ingest(self.forum_profile, posts), 2)
+        # Posts already stored are skipped
+        self.assertEqual(ForumPost.ingest(self.forum_profile, posts), 0)
+        forum_post = ForumPost.objects.get(message_id=self.post['message_id'])
+        bonus_pct = self.forum_rank.bonus_percentage
+        expected_bonus = config.POST_POINTS_MULTIPLIER * (bonus_pct/100)
+        expected_total = config.POST_POINTS_MULTIPLIER + expected_bonus
+        self.assertEqual(forum_post.total_points, expected_total)
+        self.assertTrue(forum_post.credited)
+
+    @patch('venue.models.Campaign')
+    def test_posts_tracking(self, campaign_mock):
+        campaign_mock.get_current.return_value = self.campaign
+        posts = [self.post, dict(self.post, message_id='98372738')]
+        ForumPost.ingest(self.forum_profile, posts)
+        # Age the first post past the maturation period
+        old_post = ForumPost.objects.filter(message_id='98372737')
+        old_post.update(timestamp=timezone.now() - timedelta(
+            hours=config.MATURATION_PERIOD + 1
+        ))
+        self.assertEqual(self.forum_profile.mature_posts(), 1)
+        # Signature not found since the last scrape 10 minutes ago
+        self.forum_profile.last_scrape = timezone.now() - timedelta(minutes=10)
+        self.forum_profile.last_page_status = [{
+            'status_code': 200,
+            'page_ok': True,
+            'signature_found': False
+        }]
+        self.assertEqual(self.forum_profile.track_signature_minutes(), 1)
+        forum_post = ForumPost.objects.get(message_id='98372738')
+        self.assertEqual(forum_post.invalid_sig_minutes, 10)
+        self.assertEqual(forum_post.valid_sig_minutes, 0)
+        # The post still maturing is gone from the latest scrape
+        since = timezone.now() - timedelta(days=2)
+        self.assertEqual(self.forum_profile.mark_deleted_posts(since, []), 1)
+        forum_post.refresh_from_db()
+        self.assertFalse(forum_post.credited)
+        self.assertFalse(forum_post.monitoring)
+        # Posts monitored but not credited stop being monitored too
+        not_credited = ForumPost.objects.filter(message_id='98372737')
+        not_credited.update(credited=False, monitoring=True)
+        self.assertEqual(ForumPost.uncredit(not_credited), 0)
+        self.assertFalse(not_credited.get().monitoring)
+
+    @patch('venue.models.Campaign')
+    def test_daily_stats(self, campaign_mock):
+        campaign_mock.get_current.return_value = self.campaign
+        posts = [self.post, dict(self.post, message_id='98372738')]
+        ForumPost.ingest(self.forum_profile, posts)
+        ForumPost.objects.filter(message_id='98372737').update(
+            timestamp=timezone.now() - timedelta(
+                hours=config.MATURATION_PERIOD + 1
+            )
+        )
+        self.forum_profile.mature_posts()
+        since = timezone.now() - timedelta(days=2)
+        self.forum_profile.mark_deleted_posts(since, ['98372737'])
+        stats = UserDailyStats.objects.get(user_profile=self.user_profile)
+        self.assertEqual(stats.date, timezone.now().date())
+        self.assertEqual(stats.credited_posts, 1)
+        self.assertEqual(stats.pending_posts, 1)
+        self.assertEqual(stats.total_posts, 2)
+
+    @patch('venue.models.Campaign')
+    def test_dashboard_document(self, campaign_mock):
+        campaign_mock.get_current.return_value = self.campaign
+        ForumProfile.objects.filter(id=self.forum_profile.id).update(
+            active=True,
+            verified=True
+        )
+        ForumPost.ingest(self.forum_profile, [self.post])
+        user = self.user_profile.user
+        document, _ = UserProfile.get_dashboard(user)
+        self.assertEqual(document['user']['username'], user.username)
+        self.assertEqual(document['profiles'][0]['numPosts'], 1)
+        self.assertEqual(document['total_posts'], 1)
+        # Served from Redis until the user's data changes
+        self.assertEqual(
+            UserProfile.get_dashboard(user)[0]['version'],
+            document['version']
+        )
+        # Rebuilding an unchanged document keeps its version
+        self.assertEqual(
+            self.user_profile.refresh_dashboard()['version'],
+            document['version']
+        )
+        self.forum_profile.verified = False
+        self.forum_profile.save()
+        self.assertNotEqual(
+            UserProfile.get_dashboard(user)[0]['version'],
+            document['version']
+        )
+
+    @patch('venue.tasks.compute_ranking')
+    @patch('venue.models.Campaign')
+    def test_downtime_uncredits_posts(self, campaign_mock, ranking_mock):
+        campaign_mock.get_current.return_value = self.campaign
+        posts = [self.post, dict(self.post, message_id='98372738')]
+        ForumPost.ingest(self.forum_profile, posts)
+        ForumProfile.objects.filter(id=self.forum_profile.id).update(
+            active=True
+        )
+        # Signature missing for the whole maturation period
+        max_minutes = config.MATURATION_PERIOD * 60
+        ForumPost.objects.filter(message_id='98372737').update(
+            invalid_sig_minutes=max_minutes
+        )
+        compute_points.run()
+        downtime_post = ForumPost.objects.get(message_id='98372737')
+        self.assertFalse(downtime_post.credited)
+        self.assertFalse(downtime_post.monitoring)
+        self.assertTrue(ForumPost.objects.get(message_id='98372738').credited)
+        ranking_mock.delay.assert_called_once_with()
+
+
+class RankingTest(TestCase):
+    """ Tests the ranking of the users by their credited points """
+
+    def setUp(self):
+        mommy.make(Campaign, campaign_start=timezone.now() - timedelta(days=1))
+        forum_rank = mommy.make(ForumUserRank)
+        self.user_profiles = []
+        for points in [10, 30, 20]:
+            forum_profile = mommy.make(
+                ForumProfile,
+                forum_rank=forum_rank,
+                active=True,
+                verified=True,
+                forum_user_id='172792'
+            )
+            for message_id in [points, points + 1]:
+                mommy.make(
+                    ForumPost,
+                    forum_profile=forum_profile,
+                    user_profile=forum_profile.user_profile,
+                    message_id=str(message_id),
+                    timestamp=timezone.now()
+                )
+            # Uncredited posts are not counted
+            forum_profile.posts.filter(message_id=str(points)).update(
+                total_points=points
+            )
+            forum_profile.posts.filter(message_id=str(points + 1)).update(
+                total_points=100,
+                credited=False
+            )
+            self.user_profiles.append(forum_profile.user_profile)
+
+    @patch('venue.tasks.send_websocket_signal')
+    def test_compute_ranking(self, signal_mock):
+        result = compute_ranking.run()
+        self.assertEqual(result['total'], 60)
+        ranks = [x['rank'] for x in result['points']]
+        self.assertEqual(ranks, [1, 2, 3])
+        ranking = Ranking.objects.get(user_profile=self.user_profiles[1])
+        self.assertEqual(ranking.rank, 1)
+        ranking = Ranking.objects.get(user_profile=self.user_profiles[0])
+        self.assertEqual(ranking.rank, 3)
+        # Another batch on the same day replaces the day's ranks
+        compute_ranking.run()
+        self.assertEqual(Ranking.objects.count(), 3)
+        self.assertEqual(Ranking.objects.filter(batch=2).count(), 3)
+
+    @patch('venue.tasks.send_websocket_signal')
+    def test_leaderboard(self, signal_mock):
+        compute_ranking.run()
+        ranks = [leaderboard.get_rank(x.id) for x in self.user_profiles]
+        self.assertEqual(ranks, [3, 1, 2])
+        self.assertEqual(leaderboard.get_points(self.user_profiles[1].id), 30)
+        # Credited points move the user up right away
+        leaderboard.add_points({self.user_profiles[0].id: 25})
+        self.assertEqual(self.user_profiles[0].get_ranking(), 1)
+        self.assertEqual(leaderboard.get_points(self.user_profiles[0].id), 35)
+
+    @patch('venue.leaderboard.celery')
+    def test_recompute_debounce(self, celery_mock):
+        settings.REDIS_DB.delete(leaderboard.RECOMPUTE_SCHEDULED_KEY)
+        for _ in range(3):
+            leaderboard.request_recompute()
+        # A single recompute is scheduled, and put off by the requests
+        celery_mock.current_app.send_task.assert_called_once_with(
+            'venue.tasks.recompute_ranking',
+            queue='compute',
+            countdown=settings.RANKING_DEBOUNCE
+        )
+        self.assertGreater(leaderboard.recompute_delay(), 0)
+
+    @patch('venue.tasks.send_websocket_signal')
+    def test_leaderboard_snapshot(self, signal_mock):
+        UserProfile.objects.update(email_confirmed=True)
+        compute_ranking.run()
+        rows = UserProfile.get_leader_board_data()
+        self.assertEqual([x['rank'] for x in rows], [1, 2, 3])
+        self.assertEqual([x['total_points'] for x in rows], [30, 20, 10])
+        username = self.user_profiles[0].user.username
+        rows = UserProfile.get_leader_board_data(username=username)
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]['rank'], 3)
+
 
 # class SignatureMinutesMonitoringTest(TestCase):
 #     """ Tests the monitoring and categorization of signature minutes that
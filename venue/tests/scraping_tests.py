@@ -1,4 +1,5 @@
 import pytest
+from venue import background
 from venue.tasks import scrape_forum_profile, get_user_position
 from venue.models import ForumProfile, ForumSite, User
 from venue.scrapers.bitcointalk import BitcoinTalk
@@ -45,3 +46,14 @@ class TestScrapingRetries:
                     'profile_url': 'http://www.non-existent-domain.xxx'
                 }
             )
+
+    def test_shared_profile_lookup(self):
+        background.release('test_lookup', '1')
+        # The second user waits for the lookup started by the first
+        assert background.claim('test_lookup', '1', 'thor', 60)
+        assert not background.claim('test_lookup', '1', 'hulk', 60)
+        assert background.get_result('test_lookup', '1') is None
+        waiters = background.complete('test_lookup', '1', {'found': True}, 60)
+        assert set(waiters) == {'thor', 'hulk'}
+        assert background.get_result('test_lookup', '1') == {'found': True}
+        assert not background.is_in_flight('test_lookup', '1')
@@ -3,15 +3,16 @@ Volentix VENUE
 View functions 
 """
 
+import base64
+import binascii
+import hashlib
+import json
 import re
-from datetime import timedelta
-from operator import itemgetter
 
 import coreapi
 import coreschema
 import pyotp
 import shortuuid
-import rollbar
 
 from celery.result import AsyncResult
 from constance import config
@@ -22,30 +23,40 @@ from django.db.models import Sum
 from django.http import HttpResponse
 from django.shortcuts import redirect
 from django.utils import timezone
+from django.utils.cache import (
+    get_conditional_response, patch_cache_control, patch_vary_headers
+)
+from django.utils.http import http_date, quote_etag
 from django.views.decorators.csrf import ensure_csrf_cookie
 from knox.models import AuthToken
 from knox.settings import CONSTANTS as KNOX_CONSTANTS
+from redis.exceptions import RedisError
 from rest_framework import serializers, status
 from rest_framework.decorators import api_view, permission_classes, schema
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.schemas import AutoSchema
-from django.db import IntegrityError
+from django.db import IntegrityError, transaction
 
+from . import background, caching
 from .models import (
     ForumPost, ForumProfile, ForumSite, ForumUserRank, Notification,
-    Signature, UserProfile, compute_total_points, Referral
+    Signature, UserProfile, Referral
 )
 from .tasks import (
-    get_user_position, send_deletion_confirmation, send_email_change_confirmation,
+    PROFILE_LOOKUP, SIGNATURE_VERIFICATION, get_profile_check, get_user_position,
+    start_profile_lookup, verify_saved_signature,
+    send_deletion_confirmation, send_email_change_confirmation,
     send_email_confirmation, send_reset_password, set_scraping_rate, update_data,
-    verify_profile_signature, send_email)
+    send_email)
 from .utils import (
     RedisTemp, decrypt_data, encrypt_data, check_language_exists,
     translation_on, get_constant_contact_record, send_to_constant_contact,
     update_constant_contact_email
 )
 
+logger = settings.LOGGER
+
 
 def generate_token_salt(user):
     token = AuthToken.objects.create(user=user)
@@ -69,6 +80,58 @@ def points_to_percentage(points, category=None):
     return round(percentage, 2)
 
 
+def ranking_validators(request, *extra):
+    """
+    ETag and Last-Modified of the data derived from the rankings, which
+    only change when compute_ranking writes a new batch
+    :param extra: other values the response depends on
+    :return: tuple of the ETag and the Last-Modified timestamp, both None
+        if the rankings are unavailable
+    """
+    try:
+        batch, total, timestamp = settings.REDIS_DB.mget(
+            'ranking_batch',
+            'global_total_points',
+            'ranking_timestamp'
+        )
+    except RedisError as exc:
+        # Answered without validators, the clients fetch the data again
+        logger.warning('Rankings unavailable: %r' % exc)
+        return None, None
+    parts = [batch, total, config.VTX_AVAILABLE, request.query_params.urlencode()]
+    parts.extend(extra)
+    etag = hashlib.sha1(repr(parts).encode('utf-8')).hexdigest()
+    last_modified = int(timestamp) if timestamp else None
+    return quote_etag(etag), last_modified
+
+
+def conditional_response(request, etag, last_modified):
+    """
+    :return: a 304 response if the client already has this version of
+        the data, None otherwise
+    """
+    if etag is None:
+        return None
+    response = get_conditional_response(
+        request,
+        etag=etag,
+        last_modified=last_modified
+    )
+    if response is not None:
+        return set_validators(response, etag, last_modified)
+
+
+def set_validators(response, etag, last_modified):
+    if etag is not None:
+        response['ETag'] = etag
+    if last_modified:
+        response['Last-Modified'] = http_date(last_modified)
+    # Clients have to check with the server before using their copy
+    patch_cache_control(response, private=True, no_cache=True)
+    patch_vary_headers(response, ('Authorization',))
+    return response
+
+
 @ensure_csrf_cookie
 def frontend_app(request):
     print('Home page loaded')
@@ -260,17 +323,9 @@ def get_user(request):
         * `referral_code` - User's referral_code
     """
     data = {'found': False}
-    user_profile = request.user.profiles.first()
-    if user_profile:
-        data = {
-            'found': True,
-            'username': request.user.username,
-            'email': request.user.email,
-            'language': user_profile.language,
-            'email_confirmed': user_profile.email_confirmed,
-            'enabled_2fa': user_profile.enabled_2fa,
-            'referral_code': user_profile.referral_code
-        }
+    document, _ = UserProfile.get_dashboard(request.user)
+    if document:
+        data = dict(document['user'], found=True)
     return Response(data)
 
 
@@ -516,8 +571,26 @@ CHECK_PROFILE_SCHEMA = AutoSchema(
 def check_profile(request):
     """ Checks forum profile existence
 
+    The forum profile is looked up in the background. Unless the same
+    forum profile was looked up a moment ago, the response only holds
+    the handle of the lookup. Its result is pushed to the user over the
+    websocket (facility `profile_lookup`, with the `handle` and the
+    `profile` described below), or can be polled with the
+    check/profile-lookup endpoint. When the lookup fails, the users are
+    pushed the `handle` with `success` false and the message
+    `lookup_failed`, and can check the profile again.
+
     ### Response
 
+    * Status code 202 (when the lookup is in progress)
+
+            {
+                "pending": <boolean: true>,
+                "handle": <string>
+            }
+
+        * `handle` - Handle of the lookup
+
     * Status code 200 (when profile is found)
 
             {
@@ -554,57 +627,105 @@ def check_profile(request):
         * `fallback` - Fallback scraping method used
     """
     data = request.query_params
-    user = request.user
-    forum_id = data.get('forum_id')
+    forum = ForumSite.objects.get(id=resolve_forum_id(data.get('forum_id')))
+    handle = start_profile_lookup(forum, data.get('forum_user_id'), request.user)
+    return profile_lookup_response(request, handle, data.get('forum_id'))
+
+
+def resolve_forum_id(forum_id):
+    # The clients refer to bitcointalk.org as forum 1
     if str(forum_id) == '1':
         forum_site = ForumSite.objects.get(name='bitcointalk.org')
         forum_id = str(forum_site.id)
-    forum = ForumSite.objects.get(id=forum_id)
-    response = {
-        'forum_id': data.get('forum_id')
-    }
-    task = get_user_position.delay(
-        forum.id,
-        data.get('forum_user_id'),
-        user.id
-    )
-    task.get(timeout=10)
-    info = task.result
-    response['found'] = info['found']
-    if info['found']:
-        if info['status_code'] == 200 and info['position']:
-            resp_status = status.HTTP_200_OK
-            response['position'] = info['position']
-            allowed = False
-            try:
-                forum_rank = ForumUserRank.objects.get(
-                    forum_site=forum,
-                    name__iexact=info['position'].strip()
-                )
-                if forum_rank.allowed or config.TEST_MODE:
-                    allowed = True
-            except ForumUserRank.DoesNotExist as exc:
-                rollbar.report_message(
-                    f'{exc}, username: {user}, user_id: {user.id}, info: {info}',
-                    'warning'
-                )
-            response['position_allowed'] = allowed
-            response['forum_user_id'] = info['forum_user_id']
-            response['found'] = True
-            response['exists'] = info['exists']
-            if info['exists']:
-                response['verified'] = info['verified']
-                response['own'] = info['own']
-                response['active'] = info['active']
-                response['with_signature'] = info['with_signature']
-                response['forum_profile_id'] = info['forum_profile_id']
-        response['status_code'] = info['status_code']
+    return forum_id
+
+
+def profile_lookup_response(request, handle, forum_id):
+    info = background.get_result(PROFILE_LOOKUP, handle)
+    if info is None:
+        response = {'pending': True, 'handle': handle}
+        return Response(response, status=status.HTTP_202_ACCEPTED)
+    forum = ForumSite.objects.get(id=handle.split(':')[0])
+    response = get_profile_check(forum, info, request.user)
+    response['forum_id'] = forum_id
+    if response.get('position'):
+        resp_status = status.HTTP_200_OK
     else:
         resp_status = status.HTTP_400_BAD_REQUEST
-        response.update(info)
     return Response(response, status=resp_status)
 
 
+# -----------------------------
+# Check profile lookup endpoint
+# -----------------------------
+
+
+PROFILE_LOOKUP_SCHEMA = AutoSchema(
+    manual_fields=[
+        coreapi.Field(
+            'handle',
+            required=True,
+            location='query',
+            schema=coreschema.String(
+                description='Handle returned by check/profile'
+            )
+        ),
+        coreapi.Field(
+            'forum_id',
+            required=False,
+            location='query',
+            schema=coreschema.String(
+                description='Forum site ID passed to check/profile'
+            )
+        )
+    ]
+)
+
+
+@api_view(['GET'])
+@permission_classes((IsAuthenticated,))
+@schema(PROFILE_LOOKUP_SCHEMA)
+def check_profile_lookup(request):
+    """ Retrieves the result of a forum profile lookup started by
+    check/profile. The request is answered right away, poll it again
+    while the lookup is pending. Pass the `forum_id` given to
+    check/profile to get it back in the response as check/profile does.
+
+    ### Response
+
+    * Status code 202 (when the lookup is in progress)
+
+            {
+                "pending": <boolean: true>,
+                "handle": <string>
+            }
+
+    * Status codes 200 and 400 as in check/profile
+
+    * Status code 404 (when the lookup is neither in progress nor done
+      recently, start it again with check/profile)
+
+            {
+                "success": <boolean: false>,
+                "message": <string: "unknown_lookup">
+            }
+    """
+    data = request.query_params
+    handle = data.get('handle', '')
+    forum_id = data.get('forum_id') or handle.split(':')[0]
+    if str(resolve_forum_id(forum_id)) != handle.split(':')[0]:
+        response = {'success': False, 'message': 'unknown_lookup'}
+        return Response(response, status=status.HTTP_404_NOT_FOUND)
+    # Checked first, a lookup completing in between has its result read
+    in_flight = background.is_in_flight(PROFILE_LOOKUP, handle)
+    response = profile_lookup_response(request, handle, forum_id)
+    if response.status_code == status.HTTP_202_ACCEPTED:
+        if not in_flight:
+            response = {'success': False, 'message': 'unknown_lookup'}
+            return Response(response, status=status.HTTP_404_NOT_FOUND)
+    return response
+
+
 # -----------------------
 # Save signature endpoint
 # -----------------------
@@ -632,58 +753,71 @@ SAVE_SIGNATURE_SCHEMA = AutoSchema(
 @permission_classes((IsAuthenticated,))
 @schema(SAVE_SIGNATURE_SCHEMA)
 def save_signature(request):
-    log_opts = {
-        'level': 'info',
-        'meta': {}
-    }
-
     """ Saves signature
 
+    The signature is then verified in the background, and the outcome
+    pushed to the user over the websocket (facility
+    `signature_verification`), as in the outcomes below. Saving the same
+    signature again while it is being verified doesn't verify the
+    profile twice, saving another one verifies that one as well.
+
     ### Response
 
-    * Status code 200
+    * Status code 202
 
             {
                 "success": <boolean: true>,
-                "task_id": <string>
+                "pending": <boolean: true>
             }
 
         * `success` - Whether saving the signature succeeded or not
+
+    * Pushed outcome, when the signature is found
+
+            {
+                "success": <boolean: true>,
+                "forum_profile_id": <string>,
+                "signature_id": <string>,
+                "task_id": <string>
+            }
+
+        * `signature_id` - ID of the verified signature
         * `task_id` - ID of background task that scraped the profile
 
-    * Status code 400
+    * Pushed outcome, when the signature is not found
 
             {
                 "success": <boolean: false>,
+                "forum_profile_id": <string>,
+                "signature_id": <string>,
                 "message": <string>
             }
 
-        * `message` - Error message
+        * `message` - Error message: `signature_not_found`,
+          `verification_failed` when the profile could not be scraped, or
+          `signature_changed` when another signature was saved meanwhile
     """
     data = request.data
     forum_profile = ForumProfile.objects.get(id=data['forum_profile_id'])
     signature = Signature.objects.get(id=data['signature_id'])
     forum_profile.signature = signature
     forum_profile.save()
-    response = {'success': True}
-    verified = verify_profile_signature(
-        forum_profile.forum.id,
-        forum_profile.id,
-        signature.id
+    started = background.claim(
+        SIGNATURE_VERIFICATION,
+        '%s:%s' % (forum_profile.id, signature.id),
+        request.user.username,
+        settings.SIGNATURE_VERIFICATION_TIMEOUT
     )
-    if verified:
-        forum_profile.verified = True
-        forum_profile.date_verified = timezone.now()
-        forum_profile.save()
-        # Update the data for this newly verified forum profile
-        job = update_data.delay(forum_profile.id)
-        response['task_id'] = job.id
-        resp_status = status.HTTP_200_OK
-    else:
-        response['success'] = False
-        response['message'] = 'signature_not_found'
-        resp_status = status.HTTP_400_BAD_REQUEST
-    return Response(response, status=resp_status)
+    if started:
+        # Sent once the new signature is visible to the workers
+        transaction.on_commit(
+            lambda: verify_saved_signature.delay(
+                forum_profile.id,
+                signature.id
+            )
+        )
+    response = {'success': True, 'pending': True}
+    return Response(response, status=status.HTTP_202_ACCEPTED)
 
 
 # -------------------------
@@ -706,9 +840,11 @@ def get_site_configs(request):
         * `disable_sign_up` - Whether the sign up is disabled or not
 
     """
-    configs = {
-        'disable_sign_up': config.DISABLE_SIGN_UP
-    }
+    configs = caching.get_or_compute(
+        caching.SITE_CONFIGS,
+        ['configs'],
+        lambda: {'disable_sign_up': config.DISABLE_SIGN_UP}
+    )
     return Response(configs)
 
 
@@ -717,6 +853,18 @@ def get_site_configs(request):
 # ------------------
 
 
+def build_sitewide_stats():
+    users_with_fp_count = UserProfile.objects.filter(
+        forum_profiles__active=True, forum_profiles__verified=True
+    ).count()
+    total_posts = ForumPost.objects.filter(forum_profile__verified=True).count()
+    return {
+        'total_users': users_with_fp_count,
+        'total_posts': total_posts,
+        'available_tokens': '{:,}'.format(config.VTX_AVAILABLE)
+    }
+
+
 @api_view(['GET'])
 @permission_classes((IsAuthenticated,))
 def get_stats(request):
@@ -800,32 +948,39 @@ def get_stats(request):
         * `total` - Total number of posts
         * `rank` - User's rank
         * `date` - Date string
+
+    * Status code 304 (When the data didn't change since the version of
+      the client, as given by the `ETag` response header sent back in
+      `If-None-Match`)
     """
+    # The user's stats come from the dashboard document, see
+    # venue.dashboard. Answer with a 304 if neither the rankings nor the
+    # document changed since the client's copy.
+    document, global_total_pts = UserProfile.get_dashboard(request.user)
+    version = document['version'] if document else None
+    etag, last_modified = ranking_validators(
+        request,
+        request.user.id,
+        str(timezone.now().date()),
+        version
+    )
+    if document and last_modified:
+        last_modified = max(document['timestamp'], last_modified)
+    not_modified = conditional_response(request, etag, last_modified)
+    if not_modified:
+        return not_modified
     response = {'success': False}
     # Initialize empty stats container dictionary
     stats = {'fresh': False}
-    # -----------------------------------
-    # Generate forum profile level stats
-    # -----------------------------------
-    profile_stats = []
-    fps = ForumProfile.objects.filter(
-        user_profile__user=request.user,
-        verified=True
-    )
-    global_total_pts = compute_total_points()
-    if fps.count():
-        for fp in fps:
-            fp_data = {
-                'forumSite': fp.forum.name,
-                'forumUserId': fp.forum_user_id,
-                'forumUserRank': fp.forum_rank.name,
-                'rankBonusPercentage': fp.forum_rank.bonus_percentage,
-                'numPosts': fp.total_posts,
-                'totalPoints': fp.total_points,
-                'VTX_Tokens': 0
-            }
+    if document and document['profiles']:
+        # -----------------------------------
+        # Generate forum profile level stats
+        # -----------------------------------
+        profile_stats = []
+        for fp_data in document['profiles']:
+            fp_data = dict(fp_data, VTX_Tokens=0)
             if global_total_pts:
-                pct_contrib = float(fp.total_points) / global_total_pts
+                pct_contrib = fp_data['totalPoints'] / global_total_pts
                 fp_tokens = pct_contrib * config.VTX_AVAILABLE
                 fp_data['VTX_Tokens'] = int(round(fp_tokens, 0))
             profile_stats.append(fp_data)
@@ -835,52 +990,35 @@ def get_stats(request):
         # Generate user-level stats
         # --------------------------
         userlevel_stats = {}
-        # Get the date string for the last seven days
-        now = timezone.now()
-        days = (now - timedelta(days=x) for x in range(7))
-        days = [str(x.date()) for x in days]
-        user_profile = UserProfile.objects.prefetch_related('posts', 'rankings').get(user=request.user)
-        userlevel_stats['daily_stats'] = []
-        # Iterate over the reversed list
-        for day in days[::-1]:
-            rank_obj = user_profile.rankings.filter(timestamp__date__lte=day).order_by('-timestamp').first()
-            rank = rank_obj.rank if rank_obj is not None else 0
-            # posts = user_profile.posts.filter(timestamp__date=day, forum_profile__verified=True).count()
-            posts = user_profile.get_num_posts(date=day)
-            userlevel_stats['daily_stats'].append(
-                {'posts': posts, 'rank': rank, 'date': day}
-            )
+        userlevel_stats['daily_stats'] = document['daily_stats']
         # Points, tokens, and overall user rank
-        userlevel_stats['total_posts'] = user_profile.get_num_posts()['total']
-        total_points = user_profile.total_points
+        userlevel_stats['total_posts'] = document['total_posts']
+        total_points = document['total_points']
         userlevel_stats['total_points'] = total_points
+        tokens = 0
         if global_total_pts:
             pct_contrib = total_points / global_total_pts
+            tokens = int(round(pct_contrib * config.VTX_AVAILABLE, 0))
         else:
             pct_contrib = 0
         userlevel_stats['total_points_pct'] = int(round(pct_contrib * 100, 0))
-        userlevel_stats['total_tokens'] = user_profile.total_tokens + user_profile.referrals_bonuses
-        userlevel_stats['overall_rank'] = user_profile.get_ranking()
+        userlevel_stats['total_tokens'] = tokens + document['referrals_bonuses']
+        userlevel_stats['overall_rank'] = document['overall_rank']
         stats['user_level'] = userlevel_stats
         # -------------------------
         # Generate site-wide stats
         # -------------------------
-        sitewide_stats = {}
-        users_with_fp_count = UserProfile.objects.filter(
-            forum_profiles__active=True, forum_profiles__verified=True
-        ).count()
-        total_posts = ForumPost.objects.filter(forum_profile__verified=True).count()
-        sitewide_stats['total_users'] = users_with_fp_count
-        sitewide_stats['total_posts'] = total_posts
-        available_tokens = '{:,}'.format(config.VTX_AVAILABLE)
-        sitewide_stats['available_tokens'] = available_tokens
-        stats['sitewide'] = sitewide_stats
+        stats['sitewide'] = caching.get_or_compute(
+            caching.POINTS,
+            ['sitewide_stats'],
+            build_sitewide_stats
+        )
     else:
         stats['fresh'] = True
     # Prepare the response
     response['stats'] = stats
     response['success'] = True
-    return Response(response)
+    return set_validators(Response(response), etag, last_modified)
 
 
 # -----------------------------
@@ -888,7 +1026,58 @@ def get_stats(request):
 # -----------------------------
 
 
+def encode_leaderboard_cursor(batch, key):
+    """ Opaque cursor to the rankings after the given (rank, username) """
+    rank, username = key
+    cursor = json.dumps([batch, rank, username])
+    return base64.urlsafe_b64encode(cursor.encode('utf-8')).decode('ascii')
+
+
+def decode_leaderboard_cursor(cursor):
+    """
+    :return: tuple of the ranking batch and the (rank, username) key
+    :raise ValueError: if the cursor is malformed
+    """
+    try:
+        cursor = base64.urlsafe_b64decode(cursor.encode('ascii'))
+        batch, rank, username = json.loads(cursor.decode('utf-8'))
+        return batch, (int(rank), str(username))
+    except (TypeError, UnicodeError, binascii.Error) as exc:
+        raise ValueError(str(exc))
+
+
+LEADERBOARD_SCHEMA = AutoSchema(
+    manual_fields=[
+        coreapi.Field(
+            'mode',
+            required=False,
+            location='query',
+            schema=coreschema.Enum(
+                ['top', 'around'],
+                description='Rankings from the top or around the user'
+            )
+        ),
+        coreapi.Field(
+            'limit',
+            required=False,
+            location='query',
+            schema=coreschema.Integer(
+                description='Number of rankings, or of rankings above and '
+                            'below the user in around mode'
+            )
+        ),
+        coreapi.Field(
+            'cursor',
+            required=False,
+            location='query',
+            schema=coreschema.String(description='Cursor of the next page')
+        )
+    ]
+)
+
+
 @api_view(['GET'])
+@schema(LEADERBOARD_SCHEMA)
 def get_leaderboard_data(request):
     """ Retrieves leaderboard stats data
 
@@ -899,6 +1088,8 @@ def get_leaderboard_data(request):
             {
                 "success": <boolean: true>,
                 "rankings": <list: Ranking>,
+                "batch": <int> or <null>,
+                "next_cursor": <string> or <null>,
                 "sitewide": {
                     "available_tokens": <int>,
                     "total_users": <int>,
@@ -916,7 +1107,10 @@ def get_leaderboard_data(request):
             }
 
         * `success` - Whether the request was successful or not
-        * `rankings` - Ordered ranking list
+        * `rankings` - Ordered ranking list, one page of it
+        * `batch` - Ranking batch the rankings come from
+        * `next_cursor` - Cursor to pass to get the next page, null on the
+          last page
         * `sitewide` - Stats sitewide
         * `available_tokens` - Total available tokens
         * `total_users` - Total number of users
@@ -966,36 +1160,86 @@ def get_leaderboard_data(request):
             }
 
         * `value` - Number of users for the forum
+
+    * Status code 304 (When the data didn't change since the version of
+      the client, as given by the `ETag` response header sent back in
+      `If-None-Match`)
     """
     response = {}
-    leader_board_data = UserProfile.get_leader_board_data()
+    data = request.query_params
+    mode = data.get('mode', 'top')
+    try:
+        limit = int(data.get('limit', settings.LEADERBOARD_PAGE_SIZE))
+    except ValueError:
+        limit = settings.LEADERBOARD_PAGE_SIZE
+    limit = max(1, min(limit, settings.LEADERBOARD_MAX_PAGE_SIZE))
+    # Answer with a 304 if the client already has this version of the
+    # data. The user's stats come from the same ranking batch as the
+    # rankings, so the batch is all the data depends on.
+    if request.user.is_anonymous():
+        etag, last_modified = ranking_validators(request)
+    else:
+        etag, last_modified = ranking_validators(request, request.user.id)
+    not_modified = conditional_response(request, etag, last_modified)
+    if not_modified:
+        return not_modified
+    userstats = {}
+    if not request.user.is_anonymous():
+        # Read the user's row of the leaderboard snapshot
+        user_data = UserProfile.get_leader_board_data(
+            username=request.user.username
+        )
+        if user_data:
+            userstats = {
+                'overall_rank': user_data[0]['rank'] or None,
+                'total_tokens': int(user_data[0]['total_tokens'] or 0)
+            }
+        elif UserProfile.objects.filter(user=request.user).exists():
+            # Not ranked yet
+            userstats = {'overall_rank': None, 'total_tokens': 0}
+    response['userstats'] = userstats
+    totals = UserProfile.get_leader_board_totals()
+    batch = totals['batch']
     # Get site-wide stats
     response['sitewide'] = {
         'available_tokens': '{:,}'.format(config.VTX_AVAILABLE),
-        'total_users': len(leader_board_data),
-        'total_posts': int(sum([x['total_posts'] for x in leader_board_data])),
-        'total_points': int(sum([x['total_points'] for x in leader_board_data]))
+        'total_users': totals['total_users'],
+        'total_posts': int(totals['total_posts']),
+        'total_points': int(totals['total_points'])
     }
-    # Order according to amount of tokens
-    if leader_board_data:
-        leader_board_data = sorted(leader_board_data, key=itemgetter('rank'))
-        response['rankings'] = leader_board_data
+    # Read the requested page of the rankings
+    if mode == 'around':
         if request.user.is_anonymous():
-            response['userstats'] = {}
-        else:
-            user_data = next(
-                (i for i in leader_board_data if i['username'] == request.user.username),
-                {}
-            )
+            response['success'] = False
+            response['message'] = 'authentication_required'
+            return Response(response, status=status.HTTP_401_UNAUTHORIZED)
+        rankings = UserProfile.get_leader_board_around(
+            request.user.username,
+            limit
+        )
+    else:
+        after = None
+        cursor = data.get('cursor')
+        if cursor:
             try:
-                total_tokens = user_data.get('total_tokens', 0)
-                total_tokens = 0 if total_tokens is None else int(total_tokens)
+                cursor_batch, after = decode_leaderboard_cursor(cursor)
             except ValueError:
-                total_tokens = 0
-            response['userstats'] = {
-                'overall_rank': user_data.get('username'),
-                'total_tokens': total_tokens
-            }
+                cursor_batch = None
+            # Cursors are only valid for the ranking batch they came from
+            if cursor_batch is None or cursor_batch != batch:
+                response['success'] = False
+                response['message'] = 'invalid_cursor'
+                return Response(response, status=status.HTTP_400_BAD_REQUEST)
+        rankings = UserProfile.get_leader_board_data(after=after, limit=limit)
+    response['rankings'] = rankings
+    response['batch'] = batch
+    response['next_cursor'] = None
+    if mode != 'around' and len(rankings) == limit:
+        last = rankings[-1]
+        response['next_cursor'] = encode_leaderboard_cursor(
+            batch,
+            (last['rank'], last['username'])
+        )
     # Generate forum stats
     forum_stats = {
         'posts': [],
@@ -1017,7 +1261,7 @@ def get_leaderboard_data(request):
         })
     response['forumstats'] = forum_stats
     response['success'] = True
-    return Response(response)
+    return set_validators(Response(response), etag, last_modified)
 
 
 # -----------------------
@@ -1705,13 +1949,20 @@ def get_languages(request):
         * `text` - Full language name (e.g. English, Japanese, French)
     """
     user_profile = request.user.profiles.first()
-    with translation_on(user_profile.language):
-        return Response(
-            [
+
+    def get_languages_list():
+        with translation_on(user_profile.language):
+            return [
                 {'value': language[0], 'text': str(language[1])}
                 for language in settings.LANGUAGES
             ]
-        )
+
+    languages = caching.get_or_compute(
+        caching.SITE_CONFIGS,
+        ['languages', user_profile.language],
+        get_languages_list
+    )
+    return Response(languages)
 
 
 # -------------------------
@@ -1911,13 +2162,21 @@ def get_notifications(request):
     """
     response = {}
     profile = request.user.profiles.first()
-    notifs = Notification.objects.filter(active=True).exclude(
-        dismissed_by=request.user
+
+    def get_notifications_list():
+        notifs = Notification.objects.filter(active=True).exclude(
+            dismissed_by=request.user
+        )
+        if profile.enabled_2fa:
+            notifs = notifs.exclude(code='2fA_notification')
+        serializer = NotificationSerializer(notifs, many=True)
+        return serializer.data
+
+    response['notifications'] = caching.get_or_compute(
+        caching.NOTIFICATIONS,
+        [request.user.id, profile.enabled_2fa],
+        get_notifications_list
     )
-    if profile.enabled_2fa:
-        notifs = notifs.exclude(code='2fA_notification')
-    serializer = NotificationSerializer(notifs, many=True)
-    response['notifications'] = serializer.data
     response['success'] = True
     return Response(response)
 
@@ -2024,10 +2283,13 @@ def get_forum_sites(request):
         * `message` - Error message, when success is false
     """
     response = {'success': False}
-    sites = ForumSite.objects.all()
-    if sites.count():
-        serializer = ForumSiteSerializer(sites, many=True)
-        response['forum_sites'] = serializer.data
+    sites = caching.get_or_compute(
+        caching.FORUM_SITES,
+        ['all'],
+        lambda: ForumSiteSerializer(ForumSite.objects.all(), many=True).data
+    )
+    if sites:
+        response['forum_sites'] = sites
         response['success'] = True
         resp_status = status.HTTP_200_OK
     else:
@@ -2338,22 +2600,35 @@ def get_signatures(request):
             user_profile__user=request.user,
             verified=True
         )
-        signatures = Signature.objects.filter(
+        signatures = list(Signature.objects.filter(
             id__in=forum_profiles.values_list('signature_id', flat=True)
-        )
+        ).prefetch_related('user_ranks'))
         fp_map = {x.signature.id: x.id for x in forum_profiles}
     else:
         forum_id = data.get('forum_site_id')
         if str(forum_id) == '1':
             forum_site = ForumSite.objects.get(name='bitcointalk.org')
             forum_id = str(forum_site.id)
-        signatures = Signature.objects.filter(
-            forum_site_id=forum_id,
-        )
+        forum_user_rank = None
         if not config.TEST_MODE and data.get('forum_user_rank'):
-            signatures = signatures.filter(
-                user_ranks__name=data.get('forum_user_rank')
+            forum_user_rank = data.get('forum_user_rank')
+
+        def get_signatures_list():
+            signatures = Signature.objects.filter(
+                forum_site_id=forum_id,
             )
+            if forum_user_rank:
+                signatures = signatures.filter(
+                    user_ranks__name=forum_user_rank
+                )
+            return list(signatures.prefetch_related('user_ranks'))
+
+        # The signatures of a forum are cached, not their usage by users
+        signatures = caching.get_or_compute(
+            caching.SIGNATURES,
+            [forum_id, forum_user_rank],
+            get_signatures_list
+        )
     forum_profile = None
     if data.get('forum_profile_id'):
         forum_profile = ForumProfile.objects.get(
@@ -2361,10 +2636,11 @@ def get_signatures(request):
         )
     if not data.get('forum_user_rank') and forum_profile:
         if forum_profile.forum_rank:
-            signatures = signatures.filter(
-                user_ranks__in=[forum_profile.forum_rank]
-            )
-    if signatures.count():
+            signatures = [
+                x for x in signatures
+                if forum_profile.forum_rank in x.user_ranks.all()
+            ]
+    if signatures:
         for sig in signatures:
             if config.TEST_MODE:
                 sig_code = sig.test_signature
@@ -2412,6 +2688,43 @@ def build_bonus_points_data(rank, posts):
     return data
 
 
+def build_sitewide_points_data(forum):
+    """ Global settings and sitewide stats of the points breakdown """
+    stats = {}
+    # Get global settings
+    stats['settings'] = {
+        'post_points_multiplier': config.POST_POINTS_MULTIPLIER,
+        'maturation_period': config.MATURATION_PERIOD
+    }
+    # Get sum of all post points
+    credited_posts = ForumPost.objects.filter(credited=True)
+    sum_base_points = credited_posts.aggregate(Sum('base_points'))
+    sum_base_points = sum_base_points['base_points__sum']
+    # Get sum of all bonus points
+    sum_bonus_points = credited_posts.aggregate(Sum('influence_bonus_pts'))
+    sum_bonus_points = sum_bonus_points['influence_bonus_pts__sum']
+    stats['sitewide_stats'] = {
+        'total_posts': credited_posts.count(),
+        'total_post_points': sum_base_points,
+        'total_bonus_points': sum_bonus_points
+    }
+    # Get the details of the bonus points
+    sitewide_bonus_points = []
+    ranks = ForumUserRank.objects.filter(
+        forum_site=forum
+    )
+    for rank in ranks:
+        posts = ForumPost.objects.filter(
+            forum_rank=rank,
+            credited=True
+        )
+        if posts.count():
+            data = build_bonus_points_data(rank, posts)
+            sitewide_bonus_points.append(data)
+    stats['sitewide_stats']['bonus_points'] = sitewide_bonus_points
+    return stats
+
+
 POINTS_BREAKDOWN_SCHEMA = AutoSchema(
     manual_fields=[
         coreapi.Field(
@@ -2493,23 +2806,12 @@ def get_points_breakdown(request):
         forum_id = str(forum_site.id)
     try:
         forum = ForumSite.objects.get(id=forum_id)
-        # Get global settings
-        stats['settings'] = {
-            'post_points_multiplier': config.POST_POINTS_MULTIPLIER,
-            'maturation_period': config.MATURATION_PERIOD
-        }
-        # Get sum of all post points
-        credited_posts = ForumPost.objects.filter(credited=True)
-        sum_base_points = credited_posts.aggregate(Sum('base_points'))
-        sum_base_points = sum_base_points['base_points__sum']
-        # Get sum of all bonus points
-        sum_bonus_points = credited_posts.aggregate(Sum('influence_bonus_pts'))
-        sum_bonus_points = sum_bonus_points['influence_bonus_pts__sum']
-        stats['sitewide_stats'] = {
-            'total_posts': credited_posts.count(),
-            'total_post_points': sum_base_points,
-            'total_bonus_points': sum_bonus_points
-        }
+        # The global settings and sitewide stats are shared by all users
+        stats.update(caching.get_or_compute(
+            caching.POINTS,
+            ['sitewide', forum_id],
+            lambda: build_sitewide_points_data(forum)
+        ))
         # Get user posts
         user_profile = UserProfile.objects.get(user=request.user)
         user_posts = ForumPost.objects.filter(user_profile=user_profile)
@@ -2540,22 +2842,12 @@ def get_points_breakdown(request):
             'upcoming_post_points': uncredited_post_pts or 0,
             'upcoming_bonus_poitns': uncredited_bonus_pts or 0,
         }
-        # Get the details of the bonus points
-        sitewide_bonus_points = []
+        # Get the details of the user's bonus points
         user_bonus_points = []
         ranks = ForumUserRank.objects.filter(
             forum_site=forum
         )
         for rank in ranks:
-            # Sitewide bonus points
-            posts = ForumPost.objects.filter(
-                forum_rank=rank,
-                credited=True
-            )
-            if posts.count():
-                data = data = build_bonus_points_data(rank, posts)
-                sitewide_bonus_points.append(data)
-            # User's bonus points
             posts = ForumPost.objects.filter(
                 user_profile=user_profile,
                 forum_rank=rank,
@@ -2564,7 +2856,6 @@ def get_points_breakdown(request):
             if posts.count():
                 data = build_bonus_points_data(rank, posts)
                 user_bonus_points.append(data)
-        stats['sitewide_stats']['bonus_points'] = sitewide_bonus_points
         stats['user_stats']['bonus_points'] = user_bonus_points
         return Response(stats)
     except ForumSite.DoesNotExist:
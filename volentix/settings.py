@@ -237,6 +237,76 @@ CELERY_TIMEZONE = 'UTC'
 
 USER_SCRAPE_INTERVAL = 300  # seconds
 
+# Longest interval between the scrapes of a dormant forum profile
+USER_SCRAPE_INTERVAL_MAX = config('USER_SCRAPE_INTERVAL_MAX', default=3600, cast=int)  # seconds
+
+# Time after which a forum profile lookup that never completed can be
+# started again, and how long a completed lookup is served to the users
+# checking the same forum profile
+PROFILE_LOOKUP_TIMEOUT = config('PROFILE_LOOKUP_TIMEOUT', default=120, cast=int)  # seconds
+PROFILE_LOOKUP_EXPIRY = config('PROFILE_LOOKUP_EXPIRY', default=60, cast=int)  # seconds
+
+# Time after which a signature verification that never completed can be
+# started again, longer than the scrapers' longest wait for the rate limit
+# (SCRAPER_RATE_LIMIT_MAX_WAIT) plus the request timeout
+SIGNATURE_VERIFICATION_TIMEOUT = config('SIGNATURE_VERIFICATION_TIMEOUT', default=300, cast=int)  # seconds
+
+# How often the posts scrape reads the last 24 hours again to detect
+# deleted posts, in between it stops at the newest post already seen
+POSTS_DELETION_CHECK_INTERVAL = config('POSTS_DELETION_CHECK_INTERVAL', default=3600, cast=int)  # seconds
+
+# Scraper HTTP client settings
+
+SCRAPER_REQUEST_TIMEOUT = config('SCRAPER_REQUEST_TIMEOUT', default=30, cast=int)  # seconds
+
+# Keep-alive connection pools of each worker process: number of hosts
+# pooled and connections kept open to each host, which also bounds the
+# concurrent requests to a host
+SCRAPER_POOL_HOSTS = config('SCRAPER_POOL_HOSTS', default=10, cast=int)
+
+SCRAPER_MAX_CONNECTIONS_PER_HOST = config(
+    'SCRAPER_MAX_CONNECTIONS_PER_HOST',
+    default=10,
+    cast=int
+)
+
+# HTML parser used by the scrapers: `lxml` or `beautifulsoup` (reference)
+SCRAPER_PARSER_BACKEND = config('SCRAPER_PARSER_BACKEND', default='lxml')
+
+# Shared scraper rate limits, in requests per second to a forum host for
+# each egress path. The rate is halved whenever the forum throttles us and
+# grows back by a fraction of the maximum with every successful fetch.
+
+SCRAPER_RATE_LIMITS = {
+    'direct': config('SCRAPER_RATE_LIMIT_DIRECT', default=2.0, cast=float),
+    'crawlera': config('SCRAPER_RATE_LIMIT_CRAWLERA', default=5.0, cast=float)
+}
+
+SCRAPER_RATE_LIMIT_MIN = 0.1
+
+SCRAPER_RATE_LIMIT_BURST = config('SCRAPER_RATE_LIMIT_BURST', default=5, cast=int)
+
+SCRAPER_RATE_LIMIT_DECREASE = 0.5
+
+SCRAPER_RATE_LIMIT_INCREASE = 0.05
+
+SCRAPER_RATE_LIMIT_MAX_WAIT = 120  # seconds
+
+SCRAPER_RATE_LIMIT_TTL = 86400  # seconds
+
+# Profile pages are shared between the lookups of the same forum user for
+# this long, compressed in Redis
+SCRAPER_PAGE_CACHE_TTL = config('SCRAPER_PAGE_CACHE_TTL', default=60, cast=int)  # seconds
+
+# Number of rankings per page of the leaderboard endpoint
+LEADERBOARD_PAGE_SIZE = config('LEADERBOARD_PAGE_SIZE', default=100, cast=int)
+LEADERBOARD_MAX_PAGE_SIZE = config('LEADERBOARD_MAX_PAGE_SIZE', default=500, cast=int)
+
+# Quiet period after which the requested ranking recompute runs, and
+# longest time it is put off by new requests
+RANKING_DEBOUNCE = config('RANKING_DEBOUNCE', default=10, cast=int)  # seconds
+RANKING_DEBOUNCE_MAX = config('RANKING_DEBOUNCE_MAX', default=60, cast=int)  # seconds
+
 CELERY_BEAT_SCHEDULE = {
     'periodic-data-update': {
         'task': 'venue.tasks.update_data',
@@ -282,6 +352,36 @@ REDIS_DB = redis.StrictRedis(
     decode_responses=True
 )
 
+# Same database without decoding, for binary values
+REDIS_BINARY_DB = redis.StrictRedis(
+    host=REDIS_HOST,
+    port=REDIS_PORT,
+    db=4,
+    password=REDIS_PASSWORD
+)
+
+# Cache shared by all the workers, see venue.caching
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django_redis.cache.RedisCache',
+        'LOCATION': REDIS_URL + '/5',
+        'KEY_PREFIX': 'venue',
+        'OPTIONS': {
+            'CLIENT_CLASS': 'django_redis.client.DefaultClient',
+            # Treat an unavailable cache as a miss
+            'IGNORE_EXCEPTIONS': True
+        }
+    }
+}
+
+# Lifetime of the cached values, they are also invalidated on change
+CACHE_TIMEOUT = config('CACHE_TIMEOUT', default=3600, cast=int)  # seconds
+
+# Expiry of the per-user dashboard documents, they are rebuilt as the
+# users' data change
+DASHBOARD_TIMEOUT = config('DASHBOARD_TIMEOUT', default=86400, cast=int)  # seconds
+
 # Postmark settings
 
 POSTMARK_TOKEN = config('POSTMARK_SERVER_TOKEN', default='this-token-does-not-work')
@@ -14,7 +14,7 @@ Including another URLconf
     2. Add a URL to urlpatterns:  url(r'^blog/', include('blog.urls'))
 """
 from venue.views import (
-    frontend_app, get_user, create_user, check_profile,
+    frontend_app, get_user, create_user, check_profile, check_profile_lookup,
     save_signature, get_site_configs, get_stats, confirm_email,
     delete_account, change_email, change_username, change_password,
     authenticate, reset_password, get_leaderboard_data, get_signature_code,
@@ -49,6 +49,7 @@ urlpatterns = [
     url(r'^api/create/forum-profile/', create_forum_profile),
 
     url(r'^api/check/profile/', check_profile),
+    url(r'^api/check/profile-lookup/', check_profile_lookup),
     url(r'^api/check/email-exists/', check_email_exists),
     url(r'^api/check/username-exists/', check_username_exists),
 